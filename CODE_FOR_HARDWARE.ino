@@ -5,15 +5,15 @@
 #include <Adafruit_SSD1306.h>
 #include <ESP8266WiFi.h>
 #include <ESP8266HTTPClient.h>
-#include <ArduinoJson.h>
 
 /* ---------- WIFI CONFIG ---------- */
 const char* ssid = "anamik";
 const char* password = "12121212";
 
 /* ---------- API CONFIG ---------- */
-const char* CHECK_API = "http://10.192.26.193:5000/api/admin/check-expiry";
-const char* FINE_API  = "http://10.192.26.193:5000/api/admin/impose-fine";
+// One call per card: lookup, check and fine. The reply is three text lines:
+// STATUS (OK/FINED/PENDING/PAID/UNKNOWN/ERROR), then two lines for the OLED.
+const char* GATE_API = "http://10.192.26.193:5000/api/scan/gate";
 
 
 /* ---------- OLED ---------- */
@@ -96,30 +96,23 @@ void loop() {
     HTTPClient http;
     WiFiClient client;
 
-    http.begin(client, CHECK_API);
-    http.addHeader("Content-Type", "application/json");
+    http.begin(client, GATE_API);
+    http.addHeader("Content-Type", "text/plain");
 
-    String payload = "{\"rfid\":\"" + uid + "\"}";
-    int code = http.POST(payload);
+    int code = http.POST(uid);
 
-    if (code == 200) {
+    if (code > 0) {
       String res = http.getString();
       Serial.println(res);
 
-      StaticJsonDocument<512> doc;
-      deserializeJson(doc, res);
-
-      bool insExpired = doc["insurance_expired"];
-      bool pucExpired = doc["puc_expired"];
-
-      if (insExpired || pucExpired) {
-        showMessage("EXPIRED!", "Imposing Fine...");
-        imposeFine(uid);
-      } else {
-        showMessage("ALL OK", "No Fine");
-      }
+      int first = res.indexOf('\n');
+      int second = res.indexOf('\n', first + 1);
+      String line1 = res.substring(first + 1, second);
+      String line2 = res.substring(second + 1);
+      line2.trim();
+      showMessage(line1, line2);
     } else {
-      showMessage("Vehicle Not Found");
+      showMessage("Server Error");
     }
 
     http.end();
@@ -129,24 +122,3 @@ void loop() {
   rfid.PCD_StopCrypto1();
   delay(3000);
 }
-
-/* ---------- IMPOSE FINE ---------- */
-void imposeFine(String uid) {
-
-  HTTPClient http;
-  WiFiClient client;
-
-  http.begin(client, FINE_API);
-  http.addHeader("Content-Type", "application/json");
-
-  String payload = "{\"rfid\":\"" + uid + "\"}";
-  int code = http.POST(payload);
-
-  if (code == 200) {
-    showMessage("FINE ISSUED", "SMS Sent");
-  } else {
-    showMessage("Fine Failed");
-  }
-
-  http.end();
-}
@@ -3,6 +3,13 @@ import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
+# Cold starts shouldn't pay for index builds; run `flask indexes ensure`
+# on deploy instead (set AUTO_CREATE_INDEXES=true to restore the old behaviour)
+os.environ.setdefault("AUTO_CREATE_INDEXES", "false")
+# Serverless functions are frozen once the response is sent, so background
+# SMS workers may never run: send inline unless configured otherwise
+os.environ.setdefault("SMS_ASYNC", "false")
+
 from app import create_app
 
 app = create_app()
@@ -1,14 +1,29 @@
 from flask import Flask
 from flask_cors import CORS
+from pymongo.errors import PyMongoError
 from .config import Config
-from .extensions import mongo
+from .extensions import mongo, init_mongo
+from .log import init_logging
+from .metrics import init_metrics, command_timer
 from .routes import register_routes
+from .services.vehicle_cache import vehicle_cache
+from .services.sms_dispatcher import sms_dispatcher
+from .services.rule_engine import rule_engine
+from .services.auth_service import token_cache
+from .services.pool_monitor import pool_monitor
+from .indexes import ensure_indexes, ensure_validators
+from .cli import register_commands
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    init_logging(app)
 
-    mongo.init_app(app)
+    init_mongo(app, event_listeners=[pool_monitor, command_timer])
+    vehicle_cache.init_app(app)
+    sms_dispatcher.init_app(app)
+    rule_engine.init_app(app)
+    token_cache.init_app(app)
 
     # 🔥 FULL CORS CONFIG (fixes OPTIONS + Authorization)
     CORS(
@@ -23,4 +38,17 @@ def create_app():
     )
 
     register_routes(app)
+    init_metrics(app)
+    register_commands(app)
+
+    # Idempotent; a database problem shouldn't stop the app from serving
+    if app.config["AUTO_CREATE_INDEXES"]:
+        try:
+            for collection, name, error in ensure_indexes(mongo.db):
+                app.logger.warning("Could not create index %s.%s: %s", collection, name, error)
+            for collection, error in ensure_validators(mongo.db):
+                app.logger.warning("Could not install the %s validator: %s", collection, error)
+        except PyMongoError as e:
+            app.logger.warning("Skipping index creation: %s", e)
+
     return app
@@ -0,0 +1,147 @@
+import click
+from flask.cli import AppGroup
+
+from .extensions import mongo
+from .indexes import ensure_indexes, ensure_validators, check_indexes
+from .services.stats_service import recompute_stats, rebuild_rollups
+from .services.ledger_service import rebuild_ledgers
+from .migrations import NON_CANONICAL_FINE, migrate_expiry_dates, migrate_fines, migrate_search_keys
+from .services.compliance_service import run_expiry_sweep
+from .services.import_service import FORMATS, detect_format, read_rows, import_vehicles
+
+
+indexes_cli = AppGroup("indexes", help="Manage MongoDB indexes.")
+stats_cli = AppGroup("stats", help="Maintain dashboard counters and report rollups.")
+migrate_cli = AppGroup("migrate", help="One-off data migrations.")
+compliance_cli = AppGroup("compliance", help="Precomputed vehicle compliance.")
+vehicles_cli = AppGroup("vehicles", help="Vehicle registry maintenance.")
+
+
+@indexes_cli.command("ensure")
+def ensure_indexes_command():
+    """Create any missing indexes and install the schema validators."""
+    errors = ensure_indexes(mongo.db)
+    for collection, name, error in errors:
+        click.echo(f"FAILED {collection}.{name}: {error}", err=True)
+    validator_errors = ensure_validators(mongo.db)
+    for collection, error in validator_errors:
+        click.echo(f"FAILED {collection} validator: {error}", err=True)
+    if errors or validator_errors:
+        raise SystemExit(1)
+    click.echo("Indexes and validators are up to date.")
+
+
+@indexes_cli.command("check")
+def check_indexes_command():
+    """Report manifest indexes that are missing and indexes never used."""
+    report = check_indexes(mongo.db)
+    for name in report["missing"]:
+        click.echo(f"MISSING {name}")
+    for name in report["unused"]:
+        click.echo(f"UNUSED  {name}")
+    if not report["missing"] and not report["unused"]:
+        click.echo("All manifest indexes exist and are in use.")
+    if report["missing"]:
+        raise SystemExit(1)
+
+
+def _warn_non_canonical():
+    count = mongo.db.fines.count_documents(NON_CANONICAL_FINE)
+    if count:
+        click.echo(f"{count} fines are not in the canonical schema and may be left out; "
+                   "run `flask migrate fines`.", err=True)
+
+
+@stats_cli.command("rebuild")
+def rebuild_stats_command():
+    """Recompute the dashboard fine counters from the fines collection."""
+    _warn_non_canonical()
+    counters = recompute_stats()
+    for key, value in counters.items():
+        click.echo(f"{key}: {value}")
+
+
+@stats_cli.command("rollups")
+def rebuild_rollups_command():
+    """Rebuild the monthly fine rollups behind /api/admin/reports."""
+    _warn_non_canonical()
+    written = rebuild_rollups()
+    click.echo(f"Wrote {written} rollup documents.")
+
+
+@stats_cli.command("ledgers")
+@click.option("--batch-size", default=1000, show_default=True)
+def rebuild_ledgers_command(batch_size):
+    """Rebuild the per-vehicle fine ledgers behind the user portal."""
+    _warn_non_canonical()
+    summary = rebuild_ledgers(batch_size, report=click.echo)
+    click.echo(f"Done: {summary}")
+
+
+@migrate_cli.command("expiry-dates")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--restart", is_flag=True, help="Ignore the saved checkpoint.")
+def migrate_expiry_dates_command(batch_size, restart):
+    """Store vehicle insurance/PUC expiry dates as BSON dates."""
+    summary = migrate_expiry_dates(batch_size, restart, report=click.echo)
+    click.echo(f"Done: {summary}")
+
+
+@migrate_cli.command("fines")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--restart", is_flag=True, help="Ignore the saved checkpoint.")
+def migrate_fines_command(batch_size, restart):
+    """Rewrite legacy fines into the canonical schema."""
+    summary = migrate_fines(batch_size, restart, report=click.echo)
+    click.echo(f"Done: {summary}")
+    if summary["converted"]:
+        # Counters, rollups and ledgers were built from the old shapes
+        recompute_stats()
+        rebuild_rollups()
+        rebuild_ledgers(batch_size)
+        click.echo("Rebuilt fine counters, rollups and ledgers.")
+
+
+@migrate_cli.command("search-keys")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--restart", is_flag=True, help="Ignore the saved checkpoint.")
+def migrate_search_keys_command(batch_size, restart):
+    """Store the normalized plate/tag keys used by the vehicle type-ahead."""
+    summary = migrate_search_keys(batch_size, restart, report=click.echo)
+    click.echo(f"Done: {summary}")
+
+
+@compliance_cli.command("sweep")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--full", is_flag=True, help="Re-evaluate every vehicle, not just recent expiries.")
+def compliance_sweep_command(batch_size, full):
+    """Precompute compliance for vehicles whose documents expired since the last run."""
+    summary = run_expiry_sweep(batch_size, full, report=click.echo)
+    click.echo(f"Done: {summary}")
+
+
+@vehicles_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Default: from the file extension.")
+@click.option("--chunk-size", default=1000, show_default=True)
+def import_vehicles_command(path, fmt, chunk_size):
+    """Import vehicles from a CSV or NDJSON file. Row errors go to stderr."""
+    fmt = fmt or detect_format(path)
+    if not fmt:
+        raise click.UsageError("Can't tell the format from the file name; pass --format.")
+    with open(path, encoding="utf-8-sig", newline="") as lines:
+        summary = import_vehicles(
+            read_rows(lines, fmt), chunk_size, max_errors=0, report=click.echo,
+            on_error=lambda line, errors: click.echo(f"line {line}: {errors}", err=True)
+        )
+    summary.pop("errors")
+    summary.pop("errors_truncated")
+    click.echo(f"Done: {summary}")
+
+
+def register_commands(app):
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(migrate_cli)
+    app.cli.add_command(compliance_cli)
+    app.cli.add_command(vehicles_cli)
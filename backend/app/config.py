@@ -1,8 +1,110 @@
 import os
 from dotenv import load_dotenv
 
+from .log import parse_sample_rates
+
 load_dotenv()   # Loads .env into environment variables
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY")
     MONGO_URI = os.getenv("MONGO_URI")
+
+    # MongoClient pool and timeouts. Size the pool for the number of
+    # concurrent gate requests per worker; /api/admin/db-stats shows how
+    # long requests wait for a connection. 0 timeouts mean "no limit".
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 0))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 0))
+
+    # Read preference for reports, stats and the vehicles list, e.g.
+    # "secondaryPreferred" on a replica set. Gate reads and all writes stay
+    # on the primary. Max staleness is -1 (unlimited) or >= 90 seconds.
+    MONGO_REPORT_READ_PREFERENCE = os.getenv("MONGO_REPORT_READ_PREFERENCE", "primary")
+    MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", -1))
+
+    # Logging (app/log.py): level, "json" or "text", per-request access
+    # lines, and the fraction of requests on hot endpoints whose INFO/DEBUG
+    # records are kept ("endpoint=rate,..."; warnings are never sampled)
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+    LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").lower() == "true"
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    LOG_SAMPLE_RATES = parse_sample_rates(os.getenv(
+        "LOG_SAMPLE_RATES",
+        "scan.gate=0.05,scan.scan_vehicle=0.05,scan.scan_batch=0.2,admin.check_expiry=0.05,admin.impose_fine=0.2"
+    ))
+
+    # Bearer token required to scrape /metrics (unset: no auth)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    # RFID tag -> vehicle cache used on the gate hot path (0 disables it)
+    VEHICLE_CACHE_MAX_SIZE = int(os.getenv("VEHICLE_CACHE_MAX_SIZE", 10000))
+    VEHICLE_CACHE_TTL = int(os.getenv("VEHICLE_CACHE_TTL", 60))
+
+    # Verified JWT payload cache used by role_required (0 disables it).
+    # The TTL bounds how long a token revoked by another worker is accepted.
+    AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 1000))
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", 300))
+
+    # Upper bound on items accepted by /api/scan/batch in one request
+    SCAN_BATCH_MAX_ITEMS = int(os.getenv("SCAN_BATCH_MAX_ITEMS", 500))
+    # Batch scans stamped further in the past or future than this (a reader
+    # whose clock never synced) are evaluated and fined at the server's time
+    SCAN_MAX_AGE_SECONDS = int(os.getenv("SCAN_MAX_AGE_SECONDS", 3600))
+    SCAN_MAX_CLOCK_SKEW_SECONDS = int(os.getenv("SCAN_MAX_CLOCK_SKEW_SECONDS", 300))
+
+    # One fine per vehicle per violation within this window (0 disables)
+    FINE_DEDUP_WINDOW_SECONDS = int(os.getenv("FINE_DEDUP_WINDOW_SECONDS", 86400))
+
+    # Vehicle type-ahead (/api/admin/vehicles/search)
+    SEARCH_MIN_CHARS = int(os.getenv("SEARCH_MIN_CHARS", 2))
+    SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", 10))
+    SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", 50))
+    # Plates scored per fuzzy query, taken from its rarest trigrams
+    SEARCH_FUZZY_CANDIDATES = int(os.getenv("SEARCH_FUZZY_CANDIDATES", 200))
+
+    # Bulk vehicle import: rows per insert_many, and per-row errors returned
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 1000))
+    IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+
+    # A payment retried with the same idempotency key gets 409 while the first
+    # attempt is younger than this; after that the retry finishes the payment
+    PAYMENT_CLAIM_TIMEOUT_SECONDS = int(os.getenv("PAYMENT_CLAIM_TIMEOUT_SECONDS", 30))
+
+    # Fines kept in each vehicle's ledger for the user portal, newest first
+    LEDGER_RECENT_FINES = int(os.getenv("LEDGER_RECENT_FINES", 50))
+
+    # Create the indexes in app/indexes.py when the app starts
+    AUTO_CREATE_INDEXES = os.getenv("AUTO_CREATE_INDEXES", "true").lower() == "true"
+
+    # SMS dispatch: "twilio", "file" (JSON lines in SMS_FILE_PATH) or "stub"
+    SMS_TRANSPORT = os.getenv("SMS_TRANSPORT", "twilio")
+    SMS_FILE_PATH = os.getenv("SMS_FILE_PATH", "sms_outbox.jsonl")
+    SMS_ASYNC = os.getenv("SMS_ASYNC", "true").lower() == "true"
+    SMS_QUEUE_SIZE = int(os.getenv("SMS_QUEUE_SIZE", 1000))
+    SMS_WORKERS = int(os.getenv("SMS_WORKERS", 2))
+    # Retries apply to queued sends only; inline sends (SMS_ASYNC=false) try once
+    SMS_MAX_RETRIES = int(os.getenv("SMS_MAX_RETRIES", 3))
+    SMS_RETRY_BACKOFF = float(os.getenv("SMS_RETRY_BACKOFF", 0.5))
+    SMS_BREAKER_THRESHOLD = int(os.getenv("SMS_BREAKER_THRESHOLD", 5))
+    SMS_BREAKER_RESET_SECONDS = int(os.getenv("SMS_BREAKER_RESET_SECONDS", 30))
+
+    TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+    TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+    TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
+
+    # Keyset pagination for the admin list endpoints
+    DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", 50))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 500))
+
+    # Fallback violation rules, used while the violation_rules collection is empty
+    VIOLATION_RULES = [
+        {"code": "INSURANCE", "type": "Insurance Expired", "field": "insurance_expiry",
+         "condition": "expired", "fine": 1000, "grace_days": 0},
+        {"code": "PUC", "type": "PUC Expired", "field": "puc_expiry",
+         "condition": "expired", "fine": 500, "grace_days": 0},
+    ]
+    RULES_RELOAD_SECONDS = int(os.getenv("RULES_RELOAD_SECONDS", 30))
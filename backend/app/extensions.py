@@ -1,3 +1,115 @@
+import threading
+
+from flask import current_app
 from flask_pymongo import PyMongo
+from flask_pymongo.helpers import BSONObjectIdConverter, BSONProvider
+from pymongo.read_preferences import (
+    Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+)
+
+
+class LazyPyMongo(PyMongo):
+    """
+    PyMongo that creates its MongoClient on first access to `cx` or `db`.
+
+    PyMongo.init_app parses the URI right away, which for mongodb+srv://
+    means SRV/TXT DNS lookups on every cold start, even for requests that
+    never touch the database. Here init_app only records the arguments.
+    Assigning `cx`/`db` directly (benchmarks, scripts) replaces the client.
+    """
+
+    def __init__(self, app=None, uri=None, *args, **kwargs):
+        self._pending = None
+        self._connect_lock = threading.Lock()
+        super().__init__(app, uri, *args, **kwargs)
+
+    def init_app(self, app, uri=None, *args, **kwargs):
+        # What PyMongo.init_app sets up besides the client, needed even
+        # before the first query
+        app.url_map.converters["ObjectId"] = BSONObjectIdConverter
+        app.json = BSONProvider(app)
+        self._cx = self._db = None
+        self._pending = (app, uri, args, kwargs)
+
+    def _connect(self):
+        with self._connect_lock:
+            if self._pending is not None:
+                app, uri, args, kwargs = self._pending
+                eager = PyMongo()
+                eager.init_app(app, uri, *args, **kwargs)
+                self._cx, self._db = eager.cx, eager.db
+                self._pending = None
+
+    @property
+    def connected(self):
+        return self._pending is None and self._cx is not None
+
+    @property
+    def cx(self):
+        if self._pending is not None:
+            self._connect()
+        return self._cx
+
+    @cx.setter
+    def cx(self, client):
+        self._pending = None
+        self._cx = client
+
+    @property
+    def db(self):
+        if self._pending is not None:
+            self._connect()
+        return self._db
+
+    @db.setter
+    def db(self, database):
+        self._pending = None
+        self._db = database
+
+
+mongo = LazyPyMongo()
+
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def init_mongo(app, event_listeners=()):
+    """
+    mongo.init_app with the pool and timeout settings from Config.
+    """
+    mongo.init_app(
+        app,
+        maxPoolSize=app.config["MONGO_MAX_POOL_SIZE"],
+        minPoolSize=app.config["MONGO_MIN_POOL_SIZE"],
+        waitQueueTimeoutMS=app.config["MONGO_WAIT_QUEUE_TIMEOUT_MS"] or None,
+        connectTimeoutMS=app.config["MONGO_CONNECT_TIMEOUT_MS"],
+        serverSelectionTimeoutMS=app.config["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        socketTimeoutMS=app.config["MONGO_SOCKET_TIMEOUT_MS"],
+        event_listeners=list(event_listeners)
+    )
+    app.extensions["report_read_preference"] = report_read_preference(app.config)
+
+
+def report_read_preference(config):
+    name = config["MONGO_REPORT_READ_PREFERENCE"]
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"MONGO_REPORT_READ_PREFERENCE must be one of {', '.join(READ_PREFERENCES)}")
+    if name == "primary":
+        return Primary()
+    # -1 means no staleness limit; otherwise the server requires >= 90 seconds
+    return READ_PREFERENCES[name](max_staleness=config["MONGO_MAX_STALENESS_SECONDS"])
+
 
-mongo = PyMongo()
+def read_db():
+    """
+    Database handle for heavy read-only endpoints (reports, stats, the
+    vehicles list). These may be served by secondaries; anything that
+    writes, or must read its own writes, keeps using mongo.db.
+    """
+    return mongo.db.with_options(read_preference=current_app.extensions["report_read_preference"])
@@ -0,0 +1,137 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from .models import Fine
+
+
+# =====================================================
+# INDEX MANIFEST
+# =====================================================
+# collection -> indexes every query path in app/routes relies on.
+# Keep this in sync when adding a new query shape.
+
+INDEXES = {
+    "vehicles": [
+        # Gate lookups (check-expiry, impose-fine, scan) and user login
+        {"keys": [("rfid_tag", ASCENDING)], "name": "vehicles_rfid_tag", "unique": True},
+        # search-vehicle
+        {"keys": [("vehicle_no", ASCENDING)], "name": "vehicles_vehicle_no"},
+        # Type-ahead prefix scans and fuzzy candidates (vehicles/search)
+        {"keys": [("plate_key", ASCENDING)], "name": "vehicles_plate_key"},
+        {"keys": [("tag_key", ASCENDING)], "name": "vehicles_tag_key"},
+        {"keys": [("plate_grams", ASCENDING)], "name": "vehicles_plate_grams"},
+        # Expiry sweep range queries, one per date field a rule can target
+        {"keys": [("insurance_expiry", ASCENDING)], "name": "vehicles_insurance_expiry"},
+        {"keys": [("puc_expiry", ASCENDING)], "name": "vehicles_puc_expiry"},
+        {"keys": [("fitness_expiry", ASCENDING)], "name": "vehicles_fitness_expiry", "sparse": True},
+        {"keys": [("road_tax_expiry", ASCENDING)], "name": "vehicles_road_tax_expiry", "sparse": True},
+        # User portal (/user/fine, pay-fines); most vehicles have no token yet
+        {"keys": [("access_token", ASCENDING)], "name": "vehicles_access_token",
+         "partialFilterExpression": {"access_token": {"$exists": True}}},
+    ],
+    "fines": [
+        # fines_by_token and pay-fines
+        {"keys": [("token", ASCENDING), ("status", ASCENDING)], "name": "fines_token_status"},
+        # Date reports and the issued_at keyset pagination of /fines
+        {"keys": [("issued_at", DESCENDING), ("_id", DESCENDING)], "name": "fines_issued_at_id"},
+        # Stats
+        {"keys": [("status", ASCENDING)], "name": "fines_status"},
+        # /api/user/fine
+        {"keys": [("vehicle_no", ASCENDING)], "name": "fines_vehicle_no"},
+        # One fine per vehicle, violation and window: each dedup key may
+        # appear in one fine only. Legacy fines without keys are exempt.
+        {"keys": [("dedup_keys", ASCENDING)], "name": "fines_dedup_keys", "unique": True,
+         "partialFilterExpression": {"dedup_keys": {"$exists": True}}},
+        # Fines settled by a payment receipt
+        {"keys": [("receipt_id", ASCENDING)], "name": "fines_receipt_id", "sparse": True},
+    ],
+    # One receipt per payment attempt; retries with the same key find it
+    "payments": [
+        {"keys": [("token", ASCENDING), ("idempotency_key", ASCENDING)],
+         "name": "payments_token_idempotency_key", "unique": True},
+    ],
+    # User portal lookups by access token (_id is the vehicle number)
+    "fine_ledgers": [
+        {"keys": [("token", ASCENDING)], "name": "fine_ledgers_token",
+         "partialFilterExpression": {"token": {"$exists": True}}},
+    ],
+    # Monthly report range reads
+    "fine_rollups": [
+        {"keys": [("period", ASCENDING)], "name": "fine_rollups_period"},
+    ],
+    # Revocations are dropped once the token would have expired anyway
+    "revoked_tokens": [
+        {"keys": [("expires_at", ASCENDING)], "name": "revoked_tokens_expires_at", "expireAfterSeconds": 0},
+    ],
+    "admins": [
+        {"keys": [("username", ASCENDING)], "name": "admins_username"},
+    ],
+}
+
+
+def _key_spec(keys):
+    return tuple((field, direction) for field, direction in keys)
+
+
+def ensure_indexes(db):
+    """
+    Create every index in the manifest. create_index is a no-op when an
+    identical index already exists, so this is safe to run on every start.
+    Returns a list of (collection, index name, error) for indexes that
+    could not be built, e.g. duplicate rfid_tag values blocking a unique index.
+    """
+    errors = []
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            try:
+                db[collection].create_index(spec["keys"], **options)
+            except OperationFailure as e:
+                errors.append((collection, spec["name"], str(e)))
+    return errors
+
+
+# collection -> $jsonSchema validator applied to new documents
+VALIDATORS = {
+    "fines": Fine.JSON_SCHEMA,
+}
+
+
+def ensure_validators(db):
+    """
+    Install the validators in VALIDATORS, creating collections as needed.
+    Returns a list of (collection, error) for validators that failed.
+    """
+    errors = []
+    for collection, schema in VALIDATORS.items():
+        options = {"validator": {"$jsonSchema": schema}, "validationLevel": "moderate"}
+        try:
+            try:
+                db.create_collection(collection, **options)
+            except CollectionInvalid:
+                db.command("collMod", collection, **options)
+        except OperationFailure as e:
+            errors.append((collection, str(e)))
+    return errors
+
+
+def check_indexes(db):
+    """
+    Compare the manifest against the database.
+    Returns {"missing": [...], "unused": [...]} where unused lists indexes
+    with no recorded accesses since the server last started ($indexStats).
+    """
+    report = {"missing": [], "unused": []}
+    for collection, specs in INDEXES.items():
+        existing = {
+            _key_spec(info["key"]): name
+            for name, info in db[collection].index_information().items()
+        }
+        for spec in specs:
+            if _key_spec(spec["keys"]) not in existing:
+                report["missing"].append(f"{collection}.{spec['name']}")
+
+        for stat in db[collection].aggregate([{"$indexStats": {}}]):
+            if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0:
+                report["unused"].append(f"{collection}.{stat['name']}")
+    return report
@@ -0,0 +1,234 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, request
+from pymongo import monitoring
+
+
+# =====================================================
+# METRICS
+# =====================================================
+# In-process metrics rendered in the Prometheus text format at /metrics.
+# Values are per worker process: scrape every worker (or sum over the
+# "instance" label) when running several.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _label_str(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[n] for n in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series):
+                    cumulative += count
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+                labels = _label_str(self.labels, key)
+                lines.append(f"{self.name}_sum{labels} {_number(series[-1])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def gauge(name, help_text, samples, metric_type="gauge"):
+    """
+    Render a metric computed at scrape time. samples: [(labels dict, value)].
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        lines.append(f"{name}{_label_str(labels.keys(), labels.values())} {_number(value)}")
+    return lines
+
+
+# ---- metrics recorded as things happen ----
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, per route.",
+    ("blueprint", "endpoint", "method")
+)
+REQUESTS = Counter(
+    "http_requests_total", "Responses per route and status code.",
+    ("blueprint", "endpoint", "method", "status")
+)
+MONGO_LATENCY = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round-trip time.",
+    ("command", "collection"),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+MONGO_FAILURES = Counter(
+    "mongodb_command_failures_total", "MongoDB commands that returned an error.",
+    ("command", "collection")
+)
+SMS_LATENCY = Histogram(
+    "sms_send_duration_seconds", "Time for one successful SMS provider call."
+)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Feeds MONGO_LATENCY from the driver's command events. The collection
+    name is only in the started event, so it is kept until the command ends.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        name = event.command_name
+        collection = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        if not isinstance(collection, str):
+            collection = ""
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (name, collection)
+
+    def _finish(self, event):
+        with self._lock:
+            return self._pending.pop((event.connection_id, event.request_id), (event.command_name, ""))
+
+    def succeeded(self, event):
+        command, collection = self._finish(event)
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=command, collection=collection)
+
+    def failed(self, event):
+        command, collection = self._finish(event)
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, command=command, collection=collection)
+        MONGO_FAILURES.inc(command=command, collection=collection)
+
+
+command_timer = CommandTimer()
+
+
+# ---- metrics read from existing components at scrape time ----
+
+def _component_metrics():
+    # Imported here: sms_dispatcher records into SMS_LATENCY from this module
+    from app.services.auth_service import token_cache
+    from app.services.pool_monitor import pool_monitor
+    from app.services.sms_dispatcher import sms_dispatcher
+    from app.services.vehicle_cache import vehicle_cache
+
+    lines = []
+    caches = [({"cache": "vehicle"}, vehicle_cache.stats()), ({"cache": "auth"}, token_cache.stats())]
+    lines += gauge("cache_hits_total", "Cache hits.", [(label, s["hits"]) for label, s in caches], "counter")
+    lines += gauge("cache_misses_total", "Cache misses.", [(label, s["misses"]) for label, s in caches], "counter")
+    lines += gauge("cache_hit_ratio", "Hits / lookups since start.", [(label, s["hit_ratio"]) for label, s in caches])
+    lines += gauge("cache_size", "Entries currently cached.", [(label, s["size"]) for label, s in caches])
+
+    sms = sms_dispatcher.stats()
+    lines += gauge("sms_messages_total", "SMS messages by outcome.", [
+        ({"outcome": outcome}, sms[key]) for outcome, key in (
+            ("enqueued", "enqueued"), ("sent", "sent"), ("failed", "failed"), ("retried", "retried"),
+            ("dropped", "dropped"), ("rejected", "rejected_by_breaker")
+        )
+    ], "counter")
+    lines += gauge("sms_queue_depth", "Messages waiting to be sent.", [({}, sms["queue_depth"])])
+    lines += gauge("sms_breaker_open", "1 while the SMS circuit breaker is not closed.",
+                   [({}, int(sms["breaker_state"] != "closed"))])
+
+    pool = pool_monitor.stats()
+    name = "mongodb_pool_checkout_wait_seconds"
+    lines += [f"# HELP {name} Time spent waiting for a pooled connection.", f"# TYPE {name} histogram"]
+    for bound, count in pool["wait_ms_buckets"].items():
+        le = "+Inf" if bound == "+Inf" else _number(int(bound) / 1000)
+        lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+    lines.append(f"{name}_sum {_number((pool['avg_wait_ms'] or 0) * pool['checkouts'] / 1000)}")
+    lines.append(f"{name}_count {pool['checkouts']}")
+    lines += gauge("mongodb_pool_checked_out", "Connections currently checked out.", [({}, pool["checked_out"])])
+    return lines
+
+
+def render_metrics():
+    lines = []
+    for metric in (REQUEST_LATENCY, REQUESTS, MONGO_LATENCY, MONGO_FAILURES, SMS_LATENCY):
+        lines += metric.render()
+    lines += _component_metrics()
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app):
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            # Unmatched URLs share one series to keep label cardinality bounded
+            endpoint = request.endpoint or "unmatched"
+            blueprint = request.blueprint or ""
+            REQUEST_LATENCY.observe(time.perf_counter() - started,
+                                    blueprint=blueprint, endpoint=endpoint, method=request.method)
+            REQUESTS.inc(blueprint=blueprint, endpoint=endpoint, method=request.method,
+                         status=response.status_code)
+        return response
@@ -0,0 +1,200 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from .extensions import mongo
+from .models import Vehicle, Fine, as_datetime
+from .utils.batch import iter_id_batches, load_checkpoint, save_checkpoint, clear_checkpoint, Progress
+
+
+EXPIRY_DATES_JOB = "migrate_expiry_dates"
+FINES_JOB = "migrate_fines"
+SEARCH_KEYS_JOB = "migrate_search_keys"
+
+
+def migrate_expiry_dates(batch_size=1000, restart=False, report=None):
+    """
+    Convert string insurance_expiry/puc_expiry values to BSON dates.
+
+    Streams vehicles still holding a string in either field in _id order
+    and rewrites each batch with one bulk_write. The last processed _id is
+    checkpointed, so re-running resumes where an interrupted run stopped.
+    Values that can't be parsed are left untouched and counted.
+    """
+    if restart:
+        clear_checkpoint(EXPIRY_DATES_JOB)
+    checkpoint = load_checkpoint(EXPIRY_DATES_JOB)
+
+    query = {"$or": [{field: {"$type": "string"}} for field in Vehicle.DATE_FIELDS]}
+    projection = {field: 1 for field in Vehicle.DATE_FIELDS}
+    progress = Progress(report)
+    converted = unparseable = 0
+
+    for batch in iter_id_batches(mongo.db.vehicles, query, batch_size,
+                                 checkpoint.get("last_id"), projection):
+        ops = []
+        for vehicle in batch:
+            changes = {}
+            for field in Vehicle.DATE_FIELDS:
+                value = vehicle.get(field)
+                if not isinstance(value, str):
+                    continue
+                if value.strip() == "":
+                    changes[field] = None
+                elif as_datetime(value) is None:
+                    unparseable += 1
+                else:
+                    changes[field] = as_datetime(value)
+            if changes:
+                ops.append(UpdateOne({"_id": vehicle["_id"]}, {"$set": changes}))
+
+        if ops:
+            mongo.db.vehicles.bulk_write(ops, ordered=False)
+        converted += len(ops)
+        save_checkpoint(EXPIRY_DATES_JOB, last_id=batch[-1]["_id"])
+        progress.add(len(batch), converted=converted, unparseable=unparseable)
+
+    clear_checkpoint(EXPIRY_DATES_JOB)
+    return progress.summary(converted=converted, unparseable=unparseable)
+
+
+# Fines that don't match the canonical schema in Fine.JSON_SCHEMA
+NON_CANONICAL_FINE = {"$or": [
+    {"vehicle_no": {"$not": {"$type": "string"}}},
+    {"status": {"$nin": list(Fine.STATUSES)}},
+    {"issued_at": {"$not": {"$type": "date"}}},
+    {"violations": {"$not": {"$type": "array"}}},
+    {"total_amount": {"$not": {"$type": "number"}}},
+] + [{field: {"$exists": True}} for field in Fine.LEGACY_FIELDS]}
+
+
+def _fine_vehicles(batch):
+    """
+    Vehicles of the batch's fines that lack vehicle details, by rfid_tag.
+    """
+    tags = {f["rfid_tag"] for f in batch
+            if f.get("rfid_tag") and not (f.get("vehicle_no") and f.get("mobile_number"))}
+    if not tags:
+        return {}
+    return {
+        v["rfid_tag"]: v
+        for v in mongo.db.vehicles.find(
+            {"rfid_tag": {"$in": list(tags)}},
+            {"rfid_tag": 1, "vehicle_no": 1, "owner_name": 1, "mobile_number": 1}
+        )
+    }
+
+
+def normalize_fine(fine, vehicle=None):
+    """
+    Return ($set, $unset) bringing one fine to the canonical schema.
+    Legacy fields are moved under "legacy" rather than dropped.
+    """
+    changes, legacy = {}, {}
+    for field in Fine.LEGACY_FIELDS:
+        if field in fine:
+            legacy[field] = fine[field]
+
+    if vehicle:
+        for field in ("vehicle_no", "owner_name", "mobile_number"):
+            if not fine.get(field) and vehicle.get(field):
+                changes[field] = vehicle[field]
+
+    status = str(fine.get("status") or "UNPAID").upper()
+    status = Fine.LEGACY_STATUSES.get(status, status)
+    if status != fine.get("status"):
+        changes["status"] = status
+
+    if not isinstance(fine.get("issued_at"), datetime):
+        issued_at = as_datetime(fine.get("issued_at")) or as_datetime(fine.get("created_at"))
+        # Last resort: the insert time recorded in the ObjectId
+        changes["issued_at"] = issued_at or fine["_id"].generation_time.replace(tzinfo=None)
+
+    violations = fine.get("violations")
+    if not isinstance(violations, list):
+        violations = changes["violations"] = Fine.violations_from_issues(
+            fine.get("issues") or fine.get("reason"), fine.get("amount")
+        )
+    if not isinstance(fine.get("total_amount"), (int, float)):
+        changes["total_amount"] = sum(v.get("fine") or 0 for v in violations)
+
+    if legacy:
+        changes["legacy"] = legacy
+    return changes, {field: "" for field in legacy}
+
+
+def migrate_fines(batch_size=1000, restart=False, report=None):
+    """
+    Rewrite fines into the canonical schema (Fine.JSON_SCHEMA).
+
+    Streams non-canonical fines in _id order and rewrites each batch with
+    one bulk_write, filling missing vehicle details from the vehicles
+    collection with one $in query per batch. The last processed _id is
+    checkpointed, so re-running resumes where an interrupted run stopped.
+    Fines whose vehicle can't be found keep no vehicle_no and are counted
+    as unresolved; legacy fines that never recorded an amount get 0 and
+    are counted as unpriced; statuses that aren't a known spelling of
+    UNPAID/PAID (e.g. CANCELLED) are left as they are and counted as
+    unknown_status. All three stay non-canonical, for review.
+    """
+    if restart:
+        clear_checkpoint(FINES_JOB)
+    checkpoint = load_checkpoint(FINES_JOB)
+
+    progress = Progress(report)
+    converted = unresolved = unpriced = unknown_status = 0
+
+    for batch in iter_id_batches(mongo.db.fines, NON_CANONICAL_FINE, batch_size, checkpoint.get("last_id")):
+        vehicles = _fine_vehicles(batch)
+        ops = []
+        for fine in batch:
+            changes, unset = normalize_fine(fine, vehicles.get(fine.get("rfid_tag")))
+            if not (changes.get("vehicle_no") or fine.get("vehicle_no")):
+                unresolved += 1
+            if "violations" in changes and not isinstance(fine.get("amount"), (int, float)):
+                unpriced += 1
+            if changes.get("status", fine.get("status")) not in Fine.STATUSES:
+                unknown_status += 1
+            if changes or unset:
+                update = {"$set": changes}
+                if unset:
+                    update["$unset"] = unset
+                ops.append(UpdateOne({"_id": fine["_id"]}, update))
+
+        if ops:
+            mongo.db.fines.bulk_write(ops, ordered=False)
+        converted += len(ops)
+        save_checkpoint(FINES_JOB, last_id=batch[-1]["_id"])
+        progress.add(len(batch), converted=converted, unresolved=unresolved, unpriced=unpriced,
+                     unknown_status=unknown_status)
+
+    clear_checkpoint(FINES_JOB)
+    return progress.summary(converted=converted, unresolved=unresolved, unpriced=unpriced,
+                            unknown_status=unknown_status)
+
+
+def migrate_search_keys(batch_size=1000, restart=False, report=None):
+    """
+    Store plate_key/plate_grams/tag_key (Vehicle.search_fields) on vehicles
+    written before they existed. Resumable like the other migrations.
+    """
+    if restart:
+        clear_checkpoint(SEARCH_KEYS_JOB)
+    checkpoint = load_checkpoint(SEARCH_KEYS_JOB)
+
+    query = {"$or": [{"plate_key": {"$exists": False}}, {"tag_key": {"$exists": False}}]}
+    progress = Progress(report)
+    updated = 0
+
+    for batch in iter_id_batches(mongo.db.vehicles, query, batch_size,
+                                 checkpoint.get("last_id"), {"vehicle_no": 1, "rfid_tag": 1}):
+        ops = [UpdateOne({"_id": v["_id"]}, {"$set": Vehicle.search_fields(v)})
+               for v in batch if Vehicle.search_fields(v)]
+        if ops:
+            mongo.db.vehicles.bulk_write(ops, ordered=False)
+        updated += len(ops)
+        save_checkpoint(SEARCH_KEYS_JOB, last_id=batch[-1]["_id"])
+        progress.add(len(batch), updated=updated)
+
+    clear_checkpoint(SEARCH_KEYS_JOB)
+    return progress.summary(updated=updated)
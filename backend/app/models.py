@@ -1,13 +1,77 @@
-from datetime import datetime
+import re
+from datetime import datetime, timezone
 from bson import ObjectId
 
 
+# =====================================================
+# DATE HELPERS
+# =====================================================
+
+def naive_utc(value):
+    """
+    Dates are stored and compared as naive datetimes: an ISO string with an
+    offset ("...Z", "+05:30") is converted to UTC and its tzinfo dropped.
+    """
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def as_datetime(value):
+    """
+    Return an expiry value as a datetime. Expiry dates are stored as BSON
+    dates; legacy documents may still hold ISO strings ("2025-03-31").
+    Returns None for missing or unparseable values.
+    """
+    if isinstance(value, datetime) or value is None:
+        return naive_utc(value)
+    try:
+        return naive_utc(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_date(value):
+    """
+    Render a stored date as "YYYY-MM-DD" for API responses.
+    """
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    return value
+
+
+# =====================================================
+# SEARCH KEYS
+# =====================================================
+
+def search_key(value):
+    """
+    "mh12 ab-1234" -> "MH12AB1234": the form plates and tags are indexed
+    and searched in, whatever spacing or punctuation was typed.
+    """
+    return re.sub(r"[^0-9A-Z]", "", str(value or "").upper())
+
+
+def trigrams(key):
+    return sorted({key[i:i + 3] for i in range(len(key) - 2)})
+
+
 # =====================================================
 # VEHICLE MODEL
 # =====================================================
 
 class Vehicle:
     COLLECTION = "vehicles"
+    FIELDS = (
+        "vehicle_no", "model_no", "rfid_tag", "owner_name",
+        "insurance_expiry", "puc_expiry", "mobile_number",
+        "fitness_expiry", "road_tax_expiry"
+    )
+    REQUIRED_FIELDS = ("vehicle_no", "rfid_tag", "owner_name")
+    # Optional fitness/road tax dates can be targeted by violation rules
+    DATE_FIELDS = ("insurance_expiry", "puc_expiry", "fitness_expiry", "road_tax_expiry")
+    # Derived from vehicle_no/rfid_tag for type-ahead search; never returned
+    SEARCH_FIELDS = ("plate_key", "plate_grams", "tag_key")
 
     def __init__(
         self,
@@ -44,12 +108,31 @@ class Vehicle:
         }
 
     @staticmethod
-    def is_insurance_expired(vehicle):
-        return vehicle["insurance_expiry"] < datetime.utcnow()
+    def search_fields(vehicle):
+        """
+        Derived search fields for the vehicle_no/rfid_tag present in
+        `vehicle` (a full document or a partial update).
+        """
+        fields = {}
+        if "vehicle_no" in vehicle:
+            fields["plate_key"] = search_key(vehicle["vehicle_no"])
+            fields["plate_grams"] = trigrams(fields["plate_key"])
+        if "rfid_tag" in vehicle:
+            fields["tag_key"] = search_key(vehicle["rfid_tag"])
+        return fields
 
     @staticmethod
-    def is_puc_expired(vehicle):
-        return vehicle["puc_expiry"] < datetime.utcnow()
+    def serialize(vehicle):
+        """
+        JSON-friendly copy: string _id and "YYYY-MM-DD" expiry dates.
+        """
+        vehicle = {k: v for k, v in vehicle.items() if k not in Vehicle.SEARCH_FIELDS}
+        if "_id" in vehicle:
+            vehicle["_id"] = str(vehicle["_id"])
+        for field in Vehicle.DATE_FIELDS:
+            if field in vehicle:
+                vehicle[field] = format_date(vehicle[field])
+        return vehicle
 
 
 # =====================================================
@@ -58,35 +141,93 @@ class Vehicle:
 
 class Fine:
     COLLECTION = "fines"
+    STATUSES = ("UNPAID", "PAID")
+    # Older shapes, folded into violations/total_amount/issued_at by
+    # `flask migrate fines` and kept under "legacy" on the document
+    LEGACY_FIELDS = ("issues", "amount", "reason", "created_at")
+    # Older status spellings, mapped by `flask migrate fines`
+    LEGACY_STATUSES = {"PENDING": "UNPAID", "DUE": "UNPAID", "OPEN": "UNPAID",
+                       "SETTLED": "PAID", "COMPLETED": "PAID"}
+
+    # Fines with every field the counter, rollup and ledger rebuilds read;
+    # anything else waits for `flask migrate fines`
+    CANONICAL_QUERY = {
+        "status": {"$in": list(STATUSES)},
+        "issued_at": {"$type": "date"},
+        "violations": {"$type": "array"},
+        "total_amount": {"$type": "number"}
+    }
+
+    # Enforced on insert (validationLevel "moderate": documents written
+    # before the validator existed can still be updated)
+    JSON_SCHEMA = {
+        "bsonType": "object",
+        "required": ["vehicle_no", "status", "issued_at", "violations", "total_amount"],
+        "properties": {
+            "vehicle_no": {"bsonType": "string", "minLength": 1},
+            "rfid_tag": {"bsonType": ["string", "null"]},
+            "status": {"enum": list(STATUSES)},
+            "issued_at": {"bsonType": "date"},
+            "violations": {
+                "bsonType": "array",
+                "items": {
+                    "bsonType": "object",
+                    "required": ["type", "fine"],
+                    "properties": {
+                        "type": {"bsonType": "string"},
+                        "fine": {"bsonType": ["int", "long", "double", "decimal"], "minimum": 0}
+                    }
+                }
+            },
+            "total_amount": {"bsonType": ["int", "long", "double", "decimal"], "minimum": 0},
+            "paid_at": {"bsonType": ["date", "null"]}
+        }
+    }
 
     def __init__(
         self,
         vehicle_no,
         rfid_tag,
-        issues,
-        amount,
+        violations,
+        total_amount=None,
         status="UNPAID",
         issued_at=None,
+        owner_name=None,
+        mobile_number=None,
         _id=None
     ):
         self.id = _id
         self.vehicle_no = vehicle_no
         self.rfid_tag = rfid_tag
-        self.issues = issues
-        self.amount = amount
+        self.violations = violations
+        self.total_amount = sum(v["fine"] for v in violations) if total_amount is None else total_amount
         self.status = status
         self.issued_at = issued_at or datetime.utcnow()
+        self.owner_name = owner_name
+        self.mobile_number = mobile_number
 
     def to_dict(self):
         return {
             "vehicle_no": self.vehicle_no,
             "rfid_tag": self.rfid_tag,
-            "issues": self.issues,
-            "amount": self.amount,
+            "owner_name": self.owner_name,
+            "mobile_number": self.mobile_number,
             "status": self.status,
-            "issued_at": self.issued_at
+            "issued_at": self.issued_at,
+            "violations": self.violations,
+            "total_amount": self.total_amount
         }
 
+    @staticmethod
+    def violations_from_issues(issues, amount):
+        """
+        One violation for a legacy issue list or reason string. The amount
+        was never itemised, so it stays on a single violation.
+        """
+        if isinstance(issues, (list, tuple)):
+            issues = ", ".join(str(i) for i in issues if i)
+        return [{"type": issues or "Traffic Rule Violation", "expired_on": None, "fine": amount or 0}]
+
 
 # =====================================================
 # ADMIN MODEL
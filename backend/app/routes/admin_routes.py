@@ -1,16 +1,38 @@
-from flask import Blueprint, request, jsonify
-from app.extensions import mongo
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from app.extensions import mongo, read_db
 from functools import wraps
 from bson import ObjectId
 from datetime import datetime, timedelta
-
-from app.services.auth_service import verify_token, generate_token
+import io
+import logging
+import re
+
+from app.services.auth_service import verify_token, generate_token, revoke_token, token_cache
+from app.services.vehicle_cache import vehicle_cache, get_vehicle_by_rfid
+from app.services.sms_dispatcher import sms_dispatcher
+from app.services.pool_monitor import pool_monitor
+from app.services.stats_service import (
+    get_fine_counters, StatsNotBuilt, monthly_rollups, RollupsNotBuilt
+)
+from app.utils.pagination import wants_pagination, keyset_find, page, ndjson_stream, parse_fields
+from app.utils.export import csv_stream, gzip_stream
+from app.utils.validators import validate_vehicle
+from app.models import Vehicle, Fine, format_date, search_key
+from pymongo.errors import DuplicateKeyError
+from app.services.fine_service import fine_vehicle
+from app.services.ledger_service import get_ledger, ledger_fines
+from app.services.import_service import FORMATS, detect_format, read_rows, import_vehicles
+from app.services.search_service import search_vehicles
+from app.services.payment_service import pay_fines as settle_fines, PaymentInProgress, NothingToPay
+from app.services.compliance_service import compute_compliance, current_compliance, refresh_compliance
+from app.services.rule_engine import rule_engine, replace_rules
 from werkzeug.security import check_password_hash
 from flask import render_template
 
 import secrets
 
 admin_bp = Blueprint("admin", __name__)
+logger = logging.getLogger(__name__)
 
 # # ================= ROLE DECORATOR =================
 # def role_required(roles):
@@ -60,43 +82,134 @@ def admin_login():
     return jsonify({"token": token, "role": admin["role"]})
 
 
+@admin_bp.route("/logout", methods=["POST"])
+def admin_logout():
+    token = request.headers.get("Authorization") or request.args.get("token")
+    if not revoke_token(token):
+        return jsonify({"message": "Invalid or expired token"}), 401
+    return jsonify({"message": "Logged out"})
+
+
 
 # ================= VEHICLE =================
 @admin_bp.route("/add-vehicle", methods=["POST"])
 @role_required(["ADMIN", "SUPER_ADMIN"])
 def add_vehicle():
-    mongo.db.vehicles.insert_one(request.json) 
+    vehicle, errors = validate_vehicle(request.json)
+    if errors:
+        return jsonify({"message": "Invalid vehicle", "errors": errors}), 400
+
+    vehicle["created_at"] = datetime.utcnow()
+    vehicle["compliance"] = compute_compliance(vehicle)
+    vehicle.update(Vehicle.search_fields(vehicle))
+    try:
+        mongo.db.vehicles.insert_one(vehicle)
+    except DuplicateKeyError:
+        return jsonify({"message": "RFID tag is already registered"}), 409
+    vehicle_cache.invalidate(vehicle["rfid_tag"])
     return jsonify({"message": "Vehicle added successfully"})
 
 
+@admin_bp.route("/vehicles/import", methods=["POST"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def bulk_import_vehicles():
+    # multipart upload ("file") or a raw text/csv / application/x-ndjson body;
+    # ?format=csv|ndjson overrides the detected format
+    upload = request.files.get("file")
+    if upload:
+        stream, detected = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, detected = request.stream, detect_format(content_type=request.mimetype)
+
+    fmt = request.args.get("format") or detected
+    if fmt not in FORMATS:
+        return jsonify({"message": "Upload a .csv or .ndjson file, or pass ?format=csv|ndjson"}), 400
+
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    summary = import_vehicles(
+        read_rows(lines, fmt),
+        chunk_size=current_app.config["IMPORT_CHUNK_SIZE"],
+        max_errors=current_app.config["IMPORT_MAX_ERRORS"]
+    )
+    logger.info("Vehicle import", extra={"fields": {k: v for k, v in summary.items() if k != "errors"}})
+    return jsonify(summary)
+
+
 @admin_bp.route("/search-vehicle", methods=["POST"])
 @role_required(["ADMIN", "SUPER_ADMIN", "OFFICER"])
 def search_vehicle():
     value = request.json.get("value")
+    # Normalized keys match "MH12 AB 1234" to MH12AB1234
+    key = search_key(value)
     vehicle = mongo.db.vehicles.find_one(
-        {"$or": [{"vehicle_no": value}, {"rfid_tag": value}]}
-    )
-    if vehicle:
-        vehicle["_id"] = str(vehicle["_id"])
+        {"$or": [{"vehicle_no": value}, {"rfid_tag": value}, {"plate_key": key}, {"tag_key": key}]}
+    ) if key else None
     if not vehicle:
         return jsonify({"message": "Vehicle not found"}), 404
-    return jsonify(vehicle)
+    return jsonify(Vehicle.serialize(vehicle))
+
+
+@admin_bp.route("/vehicles/search", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN", "OFFICER"])
+def type_ahead_vehicles():
+    # ?q=MH12 AB&limit=10&fields=vehicle_no,rfid_tag&fuzzy=true
+    config = current_app.config
+    try:
+        limit = int(request.args.get("limit", config["SEARCH_DEFAULT_LIMIT"]))
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+    limit = max(1, min(limit, config["SEARCH_MAX_LIMIT"]))
+
+    query = request.args.get("q", "")
+    if len(search_key(query)) < config["SEARCH_MIN_CHARS"]:
+        return jsonify({"results": []})
+
+    try:
+        results = search_vehicles(
+            query, limit,
+            fields=parse_fields(request.args),
+            fuzzy=request.args.get("fuzzy", "false").lower() == "true",
+            candidates=config["SEARCH_FUZZY_CANDIDATES"]
+        )
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"results": results})
 
 
 @admin_bp.route("/update-vehicle/<id>", methods=["PUT"])
 @role_required(["ADMIN", "SUPER_ADMIN"])
 def update_vehicle(id):
-    mongo.db.vehicles.update_one(
-        {"_id": ObjectId(id)},
-        {"$set": request.json}
-    )
+    changes, errors = validate_vehicle(request.json, partial=True)
+    if errors:
+        return jsonify({"message": "Invalid vehicle", "errors": errors}), 400
+    if not changes:
+        return jsonify({"message": "Nothing to update"}), 400
+
+    # Returns the pre-update document so the old RFID tag can be evicted too
+    try:
+        previous = mongo.db.vehicles.find_one_and_update(
+            {"_id": ObjectId(id)},
+            {"$set": {**changes, **Vehicle.search_fields(changes)}},
+            projection={"rfid_tag": 1}
+        )
+    except DuplicateKeyError:
+        return jsonify({"message": "RFID tag is already registered"}), 409
+    if previous:
+        vehicle_cache.invalidate(previous.get("rfid_tag"), changes.get("rfid_tag"))
+        if any(field in changes for field in Vehicle.DATE_FIELDS):
+            refresh_compliance(previous["_id"])
     return jsonify({"message": "Vehicle updated"})
 
 
 @admin_bp.route("/delete-vehicle/<id>", methods=["DELETE"])
 @role_required(["SUPER_ADMIN"])
 def delete_vehicle(id):
-    mongo.db.vehicles.delete_one({"_id": ObjectId(id)})
+    deleted = mongo.db.vehicles.find_one_and_delete(
+        {"_id": ObjectId(id)},
+        projection={"rfid_tag": 1}
+    )
+    if deleted:
+        vehicle_cache.invalidate(deleted.get("rfid_tag"))
     return jsonify({"message": "Vehicle deleted"})
 
 
@@ -104,69 +217,150 @@ def delete_vehicle(id):
 @admin_bp.route("/stats", methods=["GET"])
 @role_required(["ADMIN", "SUPER_ADMIN"])
 def stats():
-    # Calculate total revenue from PAID fines
-    total_revenue = 0
-    paid_fines = mongo.db.fines.find({"status": "PAID"})
-    for fine in paid_fines:
-        total_revenue += fine.get("total_amount", 0)
-    
-    # Count unpaid fines
-    unpaid_fines_count = mongo.db.fines.count_documents({"status": "UNPAID"})
-    
+    # Counters are kept up to date as fines are issued and paid
+    try:
+        counters = get_fine_counters()
+    except StatsNotBuilt:
+        return jsonify({"message": "Stats are not built yet; run `flask stats rebuild`"}), 503
+
     return jsonify({
-        "total_vehicles": mongo.db.vehicles.count_documents({}),
-        "total_fines": mongo.db.fines.count_documents({}),
-        "unpaid_fines": unpaid_fines_count,
-        "total_amount": total_revenue,
-        "paid_fines": mongo.db.fines.count_documents({"status": "PAID"}),
-        "pending_fines": unpaid_fines_count
+        "total_vehicles": read_db().vehicles.estimated_document_count(),
+        "total_fines": counters["total_fines"],
+        "unpaid_fines": counters["unpaid_fines"],
+        "total_amount": counters["total_revenue"],
+        "paid_fines": counters["paid_fines"],
+        "pending_fines": counters["unpaid_fines"]
     })
 
+@admin_bp.route("/cache-stats", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def cache_stats():
+    return jsonify(vehicle_cache.stats())
+
+
+@admin_bp.route("/auth-stats", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def auth_stats():
+    return jsonify(token_cache.stats())
+
+
+@admin_bp.route("/db-stats", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def db_stats():
+    return jsonify({
+        "pool": pool_monitor.stats(),
+        "max_pool_size": current_app.config["MONGO_MAX_POOL_SIZE"],
+        "report_read_preference": current_app.config["MONGO_REPORT_READ_PREFERENCE"]
+    })
+
+
+@admin_bp.route("/sms-stats", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def sms_stats():
+    return jsonify(sms_dispatcher.stats())
+
+# ================= LIST HELPERS =================
+def list_filters(fields):
+    return {f: request.args[f] for f in fields if request.args.get(f)}
+
+
+def list_response(collection, key, filters, sort_field="_id", transform=None):
+    """
+    Paginated / streaming variant of the admin list endpoints.
+    ?limit=&after=<next_cursor>&fields=a,b  -> {key: [...], "next_cursor": ...}
+    ?format=ndjson                         -> one document per line, streamed
+    """
+    try:
+        cursor, limit = keyset_find(collection, filters, request.args, sort_field)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if request.args.get("format") == "ndjson":
+        if "limit" in request.args:
+            cursor = cursor.limit(limit)
+        return Response(
+            stream_with_context(ndjson_stream(cursor, transform)),
+            mimetype="application/x-ndjson"
+        )
+
+    docs, next_cursor = page(cursor, limit, sort_field)
+    if transform:
+        docs = transform(docs)
+    return jsonify({key: docs, "next_cursor": next_cursor})
+
+
+# ================= VIOLATION RULES =================
+@admin_bp.route("/rules", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def get_rules():
+    return jsonify({"rules": rule_engine.describe()})
+
+
+@admin_bp.route("/rules", methods=["PUT"])
+@role_required(["SUPER_ADMIN"])
+def update_rules():
+    """
+    Replace the violation rule set. Expected JSON:
+    {
+        "rules": [
+            {"code": "FITNESS", "type": "Fitness Certificate Expired",
+             "field": "fitness_expiry", "condition": "expired", "fine": 2000, "grace_days": 7}
+        ]
+    }
+    """
+    rules = (request.json or {}).get("rules")
+    if not isinstance(rules, list):
+        return jsonify({"message": "rules must be an array"}), 400
+    try:
+        replace_rules(rules)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"message": "Rules updated", "rules": rule_engine.describe()})
+
+
 # ================= FINES =================
+def serialize_fines(fines):
+    for fine in fines:
+        fine["_id"] = str(fine["_id"])
+    return fines
+
+
 @admin_bp.route("/fines", methods=["GET"])
 @role_required(["ADMIN", "SUPER_ADMIN", "OFFICER"])
 def view_fines():
-    fines = list(mongo.db.fines.find({}))
-    
-    # Convert ObjectId to string and add vehicle details
-    for fine in fines:
-        fine["_id"] = str(fine["_id"])
-        # If vehicle details are missing, fetch from vehicles collection
-        if not fine.get("vehicle_no"):
-            vehicle = mongo.db.vehicles.find_one({"rfid_tag": fine.get("rfid_tag")})
-            if vehicle:
-                fine["vehicle_no"] = vehicle.get("vehicle_no", "N/A")
-                fine["model_no"] = vehicle.get("model_no", "N/A")  # Add model_no
-                fine["owner_name"] = vehicle.get("owner_name", "N/A")
-                fine["mobile_number"] = vehicle.get("mobile_number", "N/A")
-    
-    return jsonify(fines)
+    if wants_pagination(request.args):
+        sort_field = "issued_at" if request.args.get("sort") == "issued_at" else "_id"
+        return list_response(
+            mongo.db.fines, "fines",
+            list_filters(("status", "rfid_tag", "vehicle_no", "token")),
+            sort_field, serialize_fines
+        )
+
+    return jsonify(serialize_fines(list(mongo.db.fines.find({}))))
 
 
 # ================= REPORTS =================
 @admin_bp.route("/reports", methods=["GET"])
 @role_required(["ADMIN", "SUPER_ADMIN"])
 def monthly_report():
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "year": {"$year": "$issued_at"},
-                    "month": {"$month": "$issued_at"}
-                },
-                "total_fines": {"$sum": 1},
-                "total_amount": {"$sum": "$amount"}
-            }
-        }
-    ]
-    return jsonify(list(mongo.db.fines.aggregate(pipeline)))
+    # ?from=2025-01&to=2025-06&by=type, served from fine_rollups only
+    start, end = request.args.get("from"), request.args.get("to")
+    for value in (start, end):
+        if value and not re.fullmatch(r"\d{4}-\d{2}", value):
+            return jsonify({"message": "from/to must be YYYY-MM"}), 400
+
+    by_type = request.args.get("by") == "type"
+    try:
+        return jsonify(monthly_rollups(start, end, by_type))
+    except RollupsNotBuilt:
+        return jsonify({"message": "Reports are not built yet; run `flask stats rollups`"}), 503
 
 
 @admin_bp.route("/reports/date", methods=["POST"])
 @role_required(["ADMIN", "SUPER_ADMIN"])
 def date_report():
     date = datetime.fromisoformat(request.json["date"])
-    fines = list(mongo.db.fines.find({
+    fines = list(read_db().fines.find({
         "issued_at": {
             "$gte": date,
             "$lt": date + timedelta(days=1)
@@ -175,14 +369,69 @@ def date_report():
     return jsonify(fines)
 
 
+REPORT_COLUMNS = ("id", "issued_at", "rfid_tag", "vehicle_no", "owner_name", "status", "amount", "violations")
+
+
+def report_rows(fines):
+    rows = []
+    for fine in serialize_fines(fines):
+        rows.append({
+            "id": fine["_id"],
+            "issued_at": fine["issued_at"].isoformat(),
+            "rfid_tag": fine.get("rfid_tag", ""),
+            "vehicle_no": fine.get("vehicle_no", ""),
+            "owner_name": fine.get("owner_name", ""),
+            "status": fine.get("status", ""),
+            "amount": fine["total_amount"],
+            "violations": ";".join(v.get("code") or v.get("type", "") for v in fine["violations"])
+        })
+    return rows
+
+
+@admin_bp.route("/reports/range", methods=["GET"])
+@role_required(["ADMIN", "SUPER_ADMIN"])
+def range_report():
+    # ?from=2025-01-01&to=2025-03-31&format=csv|ndjson&gzip=true
+    # Both days are inclusive; rows are streamed oldest first.
+    try:
+        start = datetime.fromisoformat(request.args["from"])
+        end = datetime.fromisoformat(request.args.get("to", request.args["from"]))
+    except (KeyError, ValueError):
+        return jsonify({"message": "from (and optional to) must be YYYY-MM-DD dates"}), 400
+    if end < start:
+        return jsonify({"message": "to must not be before from"}), 400
+
+    export_format = request.args.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
+        return jsonify({"message": "format must be csv or ndjson"}), 400
+
+    # Walks the fines_issued_at_id index backwards. Legacy fines lack the
+    # fields report_rows reads; `flask migrate fines` brings them in.
+    cursor = read_db().fines.find({"$and": [
+        Fine.CANONICAL_QUERY,
+        {"issued_at": {"$gte": start, "$lt": end + timedelta(days=1)}}
+    ]}).sort([("issued_at", 1), ("_id", 1)])
+
+    if export_format == "csv":
+        chunks = csv_stream(cursor, REPORT_COLUMNS, report_rows)
+        mimetype = "text/csv"
+    else:
+        chunks = ndjson_stream(cursor, report_rows)
+        mimetype = "application/x-ndjson"
+
+    filename = f"fines_{start.date()}_{end.date()}.{export_format}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if request.args.get("gzip", "").lower() in ("1", "true", "yes"):
+        chunks = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
 from datetime import datetime
 
 import secrets
 from datetime import datetime
 
-from twilio.rest import Client
-
-
 # User login page (RFID + phone)
 @admin_bp.route("/user/login-page", methods=["GET"])
 def user_login_page():
@@ -200,157 +449,27 @@ def fine_page():
     return render_template("fine.html", token=token)  # Serve fines HTML
 
 
-def send_sms_via_twilio(mobile_number, message):
-    """
-    TEMPORARY: Hardcoded Twilio credentials (for testing only)
-    """
-
-    print("\n================ TWILIO DEBUG START ================")
-
-    try:
-        print("➡️ Raw mobile_number:", mobile_number)
-        print("➡️ Type of mobile_number:", type(mobile_number))
-
-        # 🔴 TEMPORARY HARDCODED VALUES
-        account_sid = "AC6ce4fb7e878b36fdb126ef65f498caf2"
-        auth_token = "5259f15df4da3c6f8c3abc0a8cb82b48"
-        twilio_number = "+14405811723"
-
-        print("➡️ Account SID loaded:", account_sid[:6] + "****")
-        print("➡️ Twilio number:", twilio_number)
-
-        # ✅ Ensure mobile number is string
-        mobile_number = str(mobile_number).strip()
-        print("➡️ Mobile number after str():", mobile_number)
-
-        # ✅ Ensure E.164 format
-        if not mobile_number.startswith("+"):
-            to_number = "+91" + mobile_number
-        else:
-            to_number = mobile_number
-
-        print("➡️ Final TO number:", to_number)
-
-        print("➡️ Creating Twilio client...")
-        client = Client(account_sid, auth_token)
-
-        print("➡️ Sending SMS...")
-        msg = client.messages.create(
-            body=message,
-            from_=twilio_number,
-            to=to_number
-        )
-
-        print("✅ SMS SENT SUCCESSFULLY")
-        print("📨 Message SID:", msg.sid)
-        print("================ TWILIO DEBUG END ================\n")
-
-        return True
-
-    except Exception as e:
-        print("❌ TWILIO ERROR OCCURRED")
-        print("❌ Error type:", type(e))
-        print("❌ Error message:", str(e))
-        print("================ TWILIO DEBUG END ================\n")
-        return False
-
-
-
-def impose_fine_internal(vehicle, request_host_url):
-    now = datetime.now()
-    rfid = vehicle["rfid_tag"]
-
-    # Token handling
-    access_token = vehicle.get("access_token")
-    if not access_token:
-        access_token = secrets.token_urlsafe(16)
-        mongo.db.vehicles.update_one(
-            {"_id": vehicle["_id"]},
-            {"$set": {"access_token": access_token}}
-        )
-
-    violations = []
-    total_amount = 0
-
-    # Insurance check
-    try:
-        ins_expiry = datetime.fromisoformat(vehicle["insurance_expiry"])
-        if ins_expiry < now:
-            violations.append({
-                "type": "Insurance Expired",
-                "expired_on": vehicle["insurance_expiry"],
-                "fine": 1000
-            })
-            total_amount += 1000
-    except:
-        pass
-
-    # PUC check
-    try:
-        puc_expiry = datetime.fromisoformat(vehicle["puc_expiry"])
-        if puc_expiry < now:
-            violations.append({
-                "type": "PUC Expired",
-                "expired_on": vehicle["puc_expiry"],
-                "fine": 500
-            })
-            total_amount += 500
-    except:
-        pass
-
-    # If no violations → no fine
-    if not violations:
-        return None
-
-    fine_doc = {
-        "vehicle_no": vehicle["vehicle_no"],
-        "rfid_tag": rfid,
-        "owner_name": vehicle["owner_name"],
-        "mobile_number": vehicle.get("mobile_number"),
-        "status": "UNPAID",
-        "issued_at": now,
-        "token": access_token,
-        "violations": violations,
-        "total_amount": total_amount
-    }
-
-    mongo.db.fines.insert_one(fine_doc)
-
-    user_link = f"{request_host_url}api/admin/user/fine?token={access_token}"
-
-    # Send SMS
-    if vehicle.get("mobile_number"):
-        send_sms_via_twilio(
-            vehicle["mobile_number"],
-            f"Fine ₹{total_amount} issued for vehicle {vehicle['vehicle_no']}. Pay here: {user_link}"
-        )
-
-    return {
-        "total_amount": total_amount,
-        "violations": violations,
-        "link": user_link
-    }
-
 @admin_bp.route("/impose-fine", methods=["POST"])
 def impose_fine():
     rfid = request.json.get("rfid")
     if not rfid:
         return jsonify({"message": "RFID is required"}), 400
 
-    vehicle = mongo.db.vehicles.find_one({"rfid_tag": rfid})
+    vehicle = get_vehicle_by_rfid(rfid)
     if not vehicle:
         return jsonify({"message": "Vehicle not found"}), 404
 
-    result = impose_fine_internal(vehicle, request.host_url)
+    result = fine_vehicle(vehicle, request.host_url)
 
     if not result:
         return jsonify({"message": "No violations found. No fine imposed."})
 
     return jsonify({
-        "message": "Fine imposed successfully",
+        "message": "Fine already imposed" if result["already_imposed"] else "Fine imposed successfully",
         "total_amount": result["total_amount"],
         "violations": result["violations"],
-        "link": result["link"]
+        "link": result["link"],
+        "already_imposed": result["already_imposed"]
     })
 
 
@@ -360,39 +479,24 @@ def check_expiry():
     if not value:
         return jsonify({"message": "RFID is required"}), 400
 
-    vehicle = mongo.db.vehicles.find_one({"rfid_tag": value})
+    vehicle = get_vehicle_by_rfid(value)
     if not vehicle:
         return jsonify({"message": "Vehicle not found"}), 404
 
-    now = datetime.now()
-
-    insurance_expired = None
-    puc_expired = None
-
-    try:
-        insurance_expiry = datetime.fromisoformat(vehicle["insurance_expiry"])
-        insurance_expired = insurance_expiry < now
-    except:
-        pass
-
-    try:
-        puc_expiry = datetime.fromisoformat(vehicle["puc_expiry"])
-        puc_expired = puc_expiry < now
-    except:
-        pass
+    compliance = current_compliance(vehicle)
 
     # 🚨 AUTO IMPOSE FINE IF EXPIRED
-    fine_result = impose_fine_internal(vehicle, request.host_url)
+    fine_result = fine_vehicle(vehicle, request.host_url)
 
     response = {
         "vehicle_no": vehicle.get("vehicle_no"),
         "model_no": vehicle.get("model_no"),
         "owner_name": vehicle.get("owner_name"),
         "rfid_tag": vehicle.get("rfid_tag"),
-        "insurance_expiry": vehicle.get("insurance_expiry"),
-        "puc_expiry": vehicle.get("puc_expiry"),
-        "insurance_expired": insurance_expired,
-        "puc_expired": puc_expired,
+        "insurance_expiry": format_date(vehicle.get("insurance_expiry")),
+        "puc_expiry": format_date(vehicle.get("puc_expiry")),
+        "insurance_expired": compliance["insurance_expired"],
+        "puc_expired": compliance["puc_expired"],
         "fine_imposed": bool(fine_result),
         "fine_details": fine_result
     }
@@ -403,36 +507,35 @@ def check_expiry():
 
 @admin_bp.route("/fines/token/<token>", methods=["GET"])
 def fines_by_token(token):
-    fines = list(mongo.db.fines.find({"token": token}, {"_id": 0}))
+    ledger = get_ledger(token=token)
 
-    if not fines:
+    if not ledger or not ledger.get("total_fines"):
         return jsonify({"message": "Invalid or expired link"}), 404
 
-    # Ensure every fine has violations array and total_amount
-    for f in fines:
-        if "violations" not in f:
-            f["violations"] = [{"type": f.get("reason", "Traffic Rule Violation"),
-                                "expired_on": None,
-                                "fine": f.get("amount", 500)}]
-        if "total_amount" not in f:
-            f["total_amount"] = sum(v["fine"] for v in f["violations"])
-
-    total_unpaid_amount = sum(f["total_amount"] for f in fines if f["status"] == "UNPAID")
-
+    # "fines" holds the most recent LEDGER_RECENT_FINES; totals cover all
     return jsonify({
-        "fines": fines,
-        "total_unpaid_amount": total_unpaid_amount
+        "fines": ledger_fines(ledger),
+        "total_fines": ledger["total_fines"],
+        "total_amount": ledger["total_amount"],
+        "counts": ledger.get("counts", {}),
+        "total_unpaid_amount": ledger["unpaid_amount"]
     })
 
+def serialize_vehicles(docs):
+    return [Vehicle.serialize(doc) for doc in docs]
+
+
 @admin_bp.route("/vehicles", methods=["GET"])
 @role_required(["ADMIN", "SUPER_ADMIN", "OFFICER"])
 def get_all_vehicles():
-    vehicles = list(mongo.db.vehicles.find({}))
-    
-    # Convert ObjectId to string
-    for v in vehicles:
-        v["_id"] = str(v["_id"])
-    
+    if wants_pagination(request.args):
+        return list_response(
+            read_db().vehicles, "vehicles",
+            list_filters(("vehicle_no", "rfid_tag", "owner_name", "model_no")),
+            transform=serialize_vehicles
+        )
+
+    vehicles = serialize_vehicles(read_db().vehicles.find({}))
     return jsonify({"vehicles": vehicles})
 
 
@@ -444,8 +547,7 @@ def get_vehicle(vehicle_id):
     if not vehicle:
         return jsonify({"message": "Vehicle not found"}), 404
 
-    vehicle["_id"] = str(vehicle["_id"])
-    return jsonify(vehicle), 200
+    return jsonify(Vehicle.serialize(vehicle)), 200
 
 
 
@@ -531,6 +633,7 @@ def user_login():
             {"_id": vehicle["_id"]},
             {"$set": {"access_token": token}}
         )
+        vehicle_cache.invalidate(rfid)
 
     # Redirect URL to fines page with token
     fines_url = f"{request.host_url}api/admin/user/fine?token={token}"
@@ -547,65 +650,48 @@ def pay_fines():
     Mark all unpaid fines for a vehicle as PAID.
     Expected JSON:
     {
-        "token": "ACCESS_TOKEN",   # token from user link
-        "payment_method": "upi"    # optional
+        "token": "ACCESS_TOKEN",      # token from user link
+        "payment_method": "upi",      # optional
+        "idempotency_key": "..."      # optional, or the Idempotency-Key header
     }
+    Retrying with the same key returns the original receipt ("replayed": true)
+    without paying or notifying again.
     """
     try:
-        print("\n================ PAY-FINES LOG START ================")
-        
-        data = request.json
-        print("➡️ Request JSON:", data)
-
+        data = request.get_json(silent=True) or {}
         token = data.get("token")
         payment_method = data.get("payment_method", "upi")
-        print(f"➡️ Token: {token}, Payment Method: {payment_method}")
+        idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
 
-        if not token:
-            print("❌ Token missing in request")
+        if not token or not isinstance(token, str):
+            logger.info("pay-fines rejected: token missing")
             return jsonify({"message": "Token is required"}), 400
-
-        # Find all unpaid fines for this token
-        fines = list(mongo.db.fines.find({"token": token, "status": "UNPAID"}))
-        print(f"➡️ Unpaid fines found: {len(fines)}")
-
-        if not fines:
-            print("❌ No unpaid fines found for this token")
+        if not idempotency_key:
+            # Old clients: every call is a new payment attempt
+            idempotency_key = secrets.token_hex(16)
+        if not isinstance(idempotency_key, str):
+            return jsonify({"message": "Idempotency key must be a string"}), 400
+        if len(idempotency_key) > 128:
+            return jsonify({"message": "Idempotency key is too long"}), 400
+
+        try:
+            receipt, sms_queued = settle_fines(token, idempotency_key, payment_method)
+        except PaymentInProgress:
+            return jsonify({"message": "This payment is already being processed"}), 409
+        except NothingToPay:
+            logger.info("pay-fines: no unpaid fines for token")
             return jsonify({"message": "No unpaid fines found for this vehicle"}), 404
 
-        # Calculate total paid amount
-        total_paid = sum(fine.get("total_amount", 0) for fine in fines)
-        print(f"➡️ Total amount to be paid: ₹{total_paid}")
-
-        # Update all fines to PAID
-        result = mongo.db.fines.update_many(
-            {"token": token, "status": "UNPAID"},
-            {"$set": {"status": "PAID", "paid_at": datetime.now(), "payment_method": payment_method}}
-        )
-        print(f"✅ Updated fines count: {result.modified_count}")
-
-        # Optional: Send SMS confirmation
-        vehicle = mongo.db.vehicles.find_one({"access_token": token})
-        if vehicle:
-            print(f"➡️ Vehicle found: {vehicle.get('vehicle_no')}, Mobile: {vehicle.get('mobile_number')}")
-            if vehicle.get("mobile_number"):
-                sms_result = send_sms_via_twilio(
-                    vehicle["mobile_number"],
-                    f"Payment of ₹{total_paid} for vehicle {vehicle['vehicle_no']} successful. All fines cleared!"
-                )
-                print(f"➡️ SMS sent: {sms_result}")
-            else:
-                print("⚠️ Vehicle has no mobile number, SMS not sent")
-        else:
-            print("⚠️ Vehicle not found for this token, SMS not sent")
-
-        print("================ PAY-FINES LOG END ================\n")
-        return jsonify({
-            "message": "Payment successful",
-            "total_paid": total_paid,
-            "fines_cleared": len(fines)
-        })
-
-    except Exception as e:
-        print("❌ ERROR in pay-fines:", str(e))
+        logger.info("Fines paid", extra={"fields": {
+            "receipt_id": receipt["receipt_id"],
+            "fines_cleared": receipt["fines_cleared"],
+            "amount": receipt["total_paid"],
+            "payment_method": receipt["payment_method"],
+            "replayed": receipt["replayed"],
+            "sms_queued": sms_queued
+        }})
+        return jsonify({"message": "Payment successful", **receipt})
+
+    except Exception:
+        logger.exception("pay-fines failed")
         return jsonify({"message": "An error occurred during payment"}), 500
@@ -1,22 +1,40 @@
 from flask import Blueprint, request, jsonify
+from pymongo.errors import WriteError
 from app.extensions import mongo
-from datetime import datetime
+from app.models import Fine
+from app.services.stats_service import record_fines_issued
+from app.services.ledger_service import record_ledger_issued
+from app.utils.validators import validate_fine
 
 fine_bp = Blueprint("fine", __name__)
 
 @fine_bp.route("/", methods=["POST"])
 def create_fine():
-    data = request.json
+    data, errors = validate_fine(request.json)
+    if errors:
+        return jsonify({"message": "Invalid fine", "errors": errors}), 400
 
-    fine = {
-        "vehicle_no": data.get("vehicle_no"),
-        "rfid_tag": data.get("rfid_tag"),
-        "issues": data.get("issues"),
-        "amount": data.get("amount"),
-        "status": "UNPAID",
-        "created_at": datetime.utcnow()
-    }
+    # Store the vehicle details with the fine, like fines issued at the gate
+    lookup = {"rfid_tag": data["rfid_tag"]} if data["rfid_tag"] else {"vehicle_no": data["vehicle_no"]}
+    vehicle = mongo.db.vehicles.find_one(lookup, {"vehicle_no": 1, "rfid_tag": 1, "owner_name": 1, "mobile_number": 1}) or {}
+    if not (data["vehicle_no"] or vehicle.get("vehicle_no")):
+        return jsonify({"message": "Vehicle not found"}), 404
 
-    mongo.db.fines.insert_one(fine)
+    fine = Fine(
+        vehicle_no=data["vehicle_no"] or vehicle["vehicle_no"],
+        rfid_tag=data["rfid_tag"] or vehicle.get("rfid_tag"),
+        violations=data["violations"],
+        total_amount=data["total_amount"],
+        owner_name=vehicle.get("owner_name"),
+        mobile_number=vehicle.get("mobile_number")
+    ).to_dict()
+
+    try:
+        mongo.db.fines.insert_one(fine)
+    except WriteError as e:
+        # Rejected by the fines schema validator
+        return jsonify({"message": "Invalid fine", "errors": {"_": e.details.get("errmsg") if e.details else str(e)}}), 400
+    record_fines_issued([fine])
+    record_ledger_issued([fine])
 
     return jsonify({"message": "Fine issued successfully"})
@@ -1,5 +1,12 @@
-from flask import Blueprint, request, jsonify
-from app.extensions import mongo
+from flask import Blueprint, request, jsonify, current_app, Response
+from datetime import datetime, timedelta
+
+from app.services.vehicle_cache import get_vehicle_by_rfid, get_vehicles_by_rfid
+from app.services.fine_service import (
+    ensure_access_tokens, build_fine_doc, issue_fines, fine_link, notify_fine, fine_vehicle
+)
+from app.services.compliance_service import current_compliance
+from app.models import naive_utc
 
 scan_bp = Blueprint("scan", __name__)
 
@@ -8,14 +15,161 @@ def scan_vehicle():
     data = request.json
     rfid = data.get("rfid_tag")
 
-    vehicle = mongo.db.vehicles.find_one({"rfid_tag": rfid})
+    vehicle = get_vehicle_by_rfid(rfid)
 
     if not vehicle:
         return jsonify({"status": "NOT_FOUND"}), 404
 
-    issues = []
+    issues = [v["type"] for v in current_compliance(vehicle)["violations"]]
 
     return jsonify({
         "status": "OK" if not issues else "VIOLATION",
         "issues": issues
     })
+
+
+# OLED lines are at most 21 characters at text size 1
+OLED_WIDTH = 21
+
+
+def gate_reply(status, line1, line2="", http_status=200):
+    """
+    Fixed three-line plain-text reply for the gate device:
+    STATUS, then the two lines to show on the OLED.
+    """
+    body = "\n".join([status, line1[:OLED_WIDTH], line2[:OLED_WIDTH]]) + "\n"
+    return Response(body, status=http_status, mimetype="text/plain")
+
+
+@scan_bp.route("/gate", methods=["POST"])
+def gate():
+    """
+    One call per card read: look the vehicle up, evaluate it and issue
+    the fine if needed, replacing check-expiry + impose-fine.
+    Body: {"rfid": "TAG"} or the bare tag as text/plain.
+    Statuses: OK, FINED, PENDING (already fined in the dedup window and
+    not paid), PAID (already fined and paid), UNKNOWN (not registered),
+    ERROR (no tag).
+    """
+    data = request.get_json(silent=True)
+    rfid = data.get("rfid") if isinstance(data, dict) else request.get_data(as_text=True)
+    if not isinstance(rfid, str) or not rfid.strip():
+        return gate_reply("ERROR", "BAD READ", "Scan again", 400)
+    rfid = rfid.strip()
+
+    vehicle = get_vehicle_by_rfid(rfid)
+    if not vehicle:
+        return gate_reply("UNKNOWN", "NOT REGISTERED", rfid, 404)
+
+    result = fine_vehicle(vehicle, request.host_url)
+    if not result:
+        return gate_reply("OK", "ALL OK", vehicle.get("vehicle_no", ""))
+
+    codes = "+".join(v.get("code") or v["type"] for v in result["violations"])
+    if result["already_imposed"]:
+        if not result["amount_due"]:
+            return gate_reply("PAID", "FINE PAID", codes)
+        return gate_reply("PENDING", f"FINE DUE Rs{result['amount_due']}", codes)
+    return gate_reply("FINED", f"FINED Rs{result['total_amount']}", codes)
+
+
+@scan_bp.route("/batch", methods=["POST"])
+def scan_batch():
+    """
+    Process reads collected by a multi-reader gateway in one request.
+    Expected JSON (either a bare array or wrapped in "scans"):
+    [
+        {"rfid_tag": "TAG", "reader_id": "GATE-1", "scanned_at": "2025-01-01T10:00:00"}
+    ]
+    A scanned_at outside SCAN_MAX_AGE_SECONDS / SCAN_MAX_CLOCK_SKEW_SECONDS
+    of the server's clock is replaced by the server time and the result is
+    marked "scanned_at_ignored".
+    """
+    data = request.json
+    items = data.get("scans") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "A non-empty array of scans is required"}), 400
+
+    config = current_app.config
+    max_items = config["SCAN_BATCH_MAX_ITEMS"]
+    if len(items) > max_items:
+        return jsonify({"message": f"At most {max_items} scans per batch"}), 413
+
+    now = datetime.utcnow()
+    oldest = now - timedelta(seconds=config["SCAN_MAX_AGE_SECONDS"])
+    newest = now + timedelta(seconds=config["SCAN_MAX_CLOCK_SKEW_SECONDS"])
+    results = []
+    valid = []
+
+    for index, item in enumerate(items):
+        rfid = item.get("rfid_tag") if isinstance(item, dict) else None
+        if not isinstance(rfid, str) or not rfid.strip():
+            results.append({"index": index, "status": "INVALID", "message": "rfid_tag must be a non-empty string"})
+            continue
+        rfid = rfid.strip()
+
+        result = {"index": index, "rfid_tag": rfid, "reader_id": item.get("reader_id")}
+        scanned_at = now
+        if item.get("scanned_at"):
+            try:
+                scanned_at = naive_utc(datetime.fromisoformat(item["scanned_at"]))
+            except (TypeError, ValueError):
+                results.append({**result, "status": "INVALID",
+                                "message": "scanned_at must be an ISO-8601 timestamp"})
+                continue
+            # Rules and the fine date would otherwise follow the reader's clock
+            if not oldest <= scanned_at <= newest:
+                scanned_at = now
+                result["scanned_at_ignored"] = True
+
+        results.append(result)
+        valid.append((result, scanned_at))
+
+    vehicles = get_vehicles_by_rfid({result["rfid_tag"] for result, _ in valid})
+    ensure_access_tokens(vehicles.values())
+
+    fine_docs = []
+    fined = []
+    fined_tags = set()
+
+    for result, scanned_at in valid:
+        vehicle = vehicles.get(result["rfid_tag"])
+        if not vehicle:
+            result["status"] = "NOT_FOUND"
+            continue
+
+        compliance = current_compliance(vehicle, scanned_at)
+        violations, total_amount = compliance["violations"], compliance["total_amount"]
+        result["vehicle_no"] = vehicle.get("vehicle_no")
+        result["status"] = "VIOLATION" if violations else "OK"
+        result["violations"] = violations
+        result["total_amount"] = total_amount
+
+        result["fine_imposed"] = False
+        # Several readers can see the same car in one batch: fine it once
+        if violations and vehicle["rfid_tag"] not in fined_tags:
+            fined_tags.add(vehicle["rfid_tag"])
+            fine_docs.append(build_fine_doc(vehicle, violations, total_amount, scanned_at))
+            fined.append((vehicle, result))
+
+    # Fines already issued in the dedup window are not written or notified again
+    for index in issue_fines(fine_docs):
+        vehicle, result = fined[index]
+        result["fine_imposed"] = True
+        result["link"] = fine_link(request.host_url, vehicle["access_token"])
+        # Violations already fined in the dedup window are not charged again
+        result["fined_amount"] = fine_docs[index]["total_amount"]
+        notify_fine(vehicle, result["fined_amount"], result["link"])
+
+    statuses = [r["status"] for r in results]
+    return jsonify({
+        "results": results,
+        "summary": {
+            "received": len(items),
+            "ok": statuses.count("OK"),
+            "violations": statuses.count("VIOLATION"),
+            "not_found": statuses.count("NOT_FOUND"),
+            "invalid": statuses.count("INVALID"),
+            "fines_imposed": sum(1 for r in results if r.get("fine_imposed"))
+        }
+    })
@@ -1,10 +1,10 @@
 from flask import Blueprint, request, jsonify
-from app.extensions import mongo
+from app.services.ledger_service import get_ledger, ledger_fines
 
 user_bp = Blueprint("user", __name__)
 
 @user_bp.route("/fine", methods=["POST"])
 def view_fine():
     data = request.json
-    fines = list(mongo.db.fines.find({"vehicle_no": data.get("vehicle_no")}))
-    return jsonify(fines)
+    ledger = get_ledger(vehicle_no=data.get("vehicle_no"))
+    return jsonify(ledger_fines(ledger) if ledger else [])
@@ -0,0 +1,119 @@
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app.extensions import mongo
+from app.models import Vehicle
+from app.services.rule_engine import rule_engine
+from app.services.vehicle_cache import vehicle_cache
+from app.utils.batch import iter_id_batches, load_checkpoint, save_checkpoint, Progress
+
+
+SWEEP_JOB = "expiry_sweep"
+
+
+def compute_compliance(vehicle, now=None, evaluation=None):
+    """
+    Precomputed compliance status stored on the vehicle as `compliance`.
+    `valid_until` is the next moment a rule can start to apply: until then
+    the result can't change unless the vehicle itself is edited.
+    """
+    now = now or datetime.utcnow()
+    violations, total_amount, next_change = evaluation or rule_engine.evaluate(vehicle, now)
+
+    # The flags follow the rules (grace days included), None without a date
+    violated = rule_engine.violated_fields(violations)
+
+    def expired(field):
+        return field in violated if vehicle.get(field) else None
+
+    return {
+        "insurance_expired": expired("insurance_expiry"),
+        "puc_expired": expired("puc_expiry"),
+        "violations": violations,
+        "total_amount": total_amount,
+        "evaluated_at": now,
+        "valid_until": next_change,
+        "rules_version": rule_engine.current_version()
+    }
+
+
+def current_compliance(vehicle, now=None):
+    """
+    Return the vehicle's compliance, reading the precomputed sub-document
+    when it is still valid for the current rules and evaluating it on the
+    spot otherwise.
+    """
+    now = now or datetime.utcnow()
+    compliance = vehicle.get("compliance")
+    if (compliance and compliance.get("rules_version") == rule_engine.current_version()
+            and compliance["evaluated_at"] <= now
+            and (compliance["valid_until"] is None or compliance["valid_until"] > now)):
+        return compliance
+    return compute_compliance(vehicle, now)
+
+
+def refresh_compliance(vehicle_id):
+    """
+    Recompute and store compliance for one vehicle after it was edited.
+    """
+    vehicle = mongo.db.vehicles.find_one({"_id": vehicle_id})
+    if vehicle:
+        mongo.db.vehicles.update_one(
+            {"_id": vehicle_id},
+            {"$set": {"compliance": compute_compliance(vehicle)}}
+        )
+        vehicle_cache.invalidate(vehicle.get("rfid_tag"))
+
+
+def _write_batch(batch, now):
+    # One pass of the rule engine over the whole batch
+    results = rule_engine.evaluate_many(batch, now)
+    ops = [
+        UpdateOne({"_id": v["_id"]}, {"$set": {"compliance": compute_compliance(v, now, result)}})
+        for v, result in zip(batch, results)
+    ]
+    mongo.db.vehicles.bulk_write(ops, ordered=False)
+    vehicle_cache.invalidate(*(v.get("rfid_tag") for v in batch))
+
+
+def run_expiry_sweep(batch_size=1000, full=False, report=None):
+    """
+    Precompute compliance for every vehicle that started violating an
+    "expired" rule since the previous run, using one indexed range query
+    per rule, and write it back with bulk_write.
+
+    The first run (or full=True) evaluates every vehicle. Progress is
+    checkpointed in job_checkpoints: an interrupted run resumes the same
+    window from the last _id it wrote.
+    """
+    checkpoint = load_checkpoint(SWEEP_JOB)
+    last_run = None if full else checkpoint.get("last_run")
+
+    # Resume an interrupted window, otherwise start a new one ending now
+    window_end = checkpoint.get("window_end") or datetime.utcnow()
+    save_checkpoint(SWEEP_JOB, window_end=window_end)
+
+    projection = {field: 1 for field in Vehicle.FIELDS}
+    if last_run is None:
+        passes = [("all", {})]
+    else:
+        # expiry + grace in (last_run, window_end]
+        passes = [
+            (rule.code, {rule.field: {"$gt": last_run - rule.grace, "$lte": window_end - rule.grace}})
+            for rule in rule_engine.rules if rule.condition == "expired"
+        ]
+
+    progress = Progress(report)
+    for name, query in passes:
+        start_after = checkpoint.get("last_id") if checkpoint.get("pass") == name else None
+        for batch in iter_id_batches(mongo.db.vehicles, query, batch_size, start_after, projection):
+            _write_batch(batch, window_end)
+            save_checkpoint(SWEEP_JOB, window_end=window_end, **{"pass": name, "last_id": batch[-1]["_id"]})
+            progress.add(len(batch))
+
+    mongo.db.job_checkpoints.update_one(
+        {"_id": SWEEP_JOB},
+        {"$set": {"last_run": window_end}, "$unset": {"window_end": "", "pass": "", "last_id": ""}}
+    )
+    return progress.summary(window_end=window_end.isoformat())
@@ -0,0 +1,231 @@
+import secrets
+from datetime import datetime, timezone
+
+from flask import current_app
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.extensions import mongo
+from app.services.compliance_service import current_compliance
+from app.services.rule_engine import rule_engine
+from app.services.twilio_service import send_sms_via_twilio
+from app.services.stats_service import record_fines_issued
+from app.services.ledger_service import record_ledger_issued
+from app.services.vehicle_cache import vehicle_cache
+
+
+def evaluate_violations(vehicle, now=None):
+    """
+    Return (violations, total_amount) for a vehicle document, according
+    to the configured violation rules.
+    """
+    violations, total_amount, _ = rule_engine.evaluate(vehicle, now)
+    return violations, total_amount
+
+
+def ensure_access_token(vehicle):
+    """
+    Return the vehicle's portal access token, creating one if missing.
+    """
+    access_token = vehicle.get("access_token")
+    if not access_token:
+        access_token = secrets.token_urlsafe(16)
+        mongo.db.vehicles.update_one(
+            {"_id": vehicle["_id"]},
+            {"$set": {"access_token": access_token}}
+        )
+        vehicle["access_token"] = access_token
+        vehicle_cache.invalidate(vehicle.get("rfid_tag"))
+    return access_token
+
+
+def ensure_access_tokens(vehicles):
+    """
+    Batch variant of ensure_access_token: one bulk_write for all vehicles
+    that don't have a token yet.
+    """
+    ops = []
+    for vehicle in vehicles:
+        if not vehicle.get("access_token"):
+            vehicle["access_token"] = secrets.token_urlsafe(16)
+            ops.append(UpdateOne(
+                {"_id": vehicle["_id"]},
+                {"$set": {"access_token": vehicle["access_token"]}}
+            ))
+            vehicle_cache.invalidate(vehicle.get("rfid_tag"))
+    if ops:
+        mongo.db.vehicles.bulk_write(ops, ordered=False)
+
+
+def build_fine_doc(vehicle, violations, total_amount, issued_at):
+    return {
+        "vehicle_no": vehicle["vehicle_no"],
+        "rfid_tag": vehicle["rfid_tag"],
+        "owner_name": vehicle["owner_name"],
+        "mobile_number": vehicle.get("mobile_number"),
+        "status": "UNPAID",
+        "issued_at": issued_at,
+        "token": vehicle["access_token"],
+        "violations": violations,
+        "total_amount": total_amount
+    }
+
+
+def dedup_keys(fine_doc, window):
+    """
+    One key per violation: "this vehicle, this violation, this window".
+    Windows are aligned to the epoch, so a 86400s window is a UTC day.
+    """
+    # issued_at is naive UTC; a bare .timestamp() would read it as local time
+    issued_at = fine_doc["issued_at"].replace(tzinfo=timezone.utc)
+    bucket = int(issued_at.timestamp() // window)
+    return [f"{fine_doc['rfid_tag']}|{v['type']}|{bucket}" for v in fine_doc["violations"]]
+
+
+def _drop_fined(fine_docs, window):
+    """
+    Remove violations already fined in the window from each fine doc,
+    recompute its total and set its dedup_keys. Returns the docs that
+    still have a violation to fine.
+    """
+    keys = [dedup_keys(fine_doc, window) for fine_doc in fine_docs]
+    taken = set()
+    for fine in mongo.db.fines.find(
+        {"dedup_keys": {"$in": [key for doc_keys in keys for key in doc_keys]}},
+        {"dedup_keys": 1}
+    ):
+        taken.update(fine["dedup_keys"])
+
+    remaining = []
+    for fine_doc, doc_keys in zip(fine_docs, keys):
+        kept = [(v, key) for v, key in zip(fine_doc["violations"], doc_keys) if key not in taken]
+        fine_doc["violations"] = [v for v, _ in kept]
+        fine_doc["dedup_keys"] = [key for _, key in kept]
+        fine_doc["total_amount"] = sum(v["fine"] for v in fine_doc["violations"])
+        if kept:
+            remaining.append(fine_doc)
+    return remaining
+
+
+def issue_fine(fine_doc):
+    """
+    Insert a fine for the violations not already fined in the dedup window.
+    The unique index on dedup_keys makes this atomic across requests: a
+    concurrent insert for the same violation fails and is re-checked.
+    Returns True if a new fine was written.
+    """
+    window = current_app.config["FINE_DEDUP_WINDOW_SECONDS"]
+    if not window:
+        mongo.db.fines.insert_one(fine_doc)
+        record_fines_issued([fine_doc])
+        record_ledger_issued([fine_doc])
+        return True
+
+    while _drop_fined([fine_doc], window):
+        try:
+            mongo.db.fines.insert_one(fine_doc)
+        except DuplicateKeyError:
+            # Lost a race for one of the violations; drop it and retry
+            fine_doc.pop("_id", None)
+            continue
+        record_fines_issued([fine_doc])
+        record_ledger_issued([fine_doc])
+        return True
+    return False
+
+
+def issue_fines(fine_docs):
+    """
+    Batch variant of issue_fine. Returns the list indexes of the fines
+    that were newly written.
+    """
+    if not fine_docs:
+        return []
+
+    window = current_app.config["FINE_DEDUP_WINDOW_SECONDS"]
+    if not window:
+        mongo.db.fines.insert_many(fine_docs, ordered=False)
+        record_fines_issued(fine_docs)
+        record_ledger_issued(fine_docs)
+        return list(range(len(fine_docs)))
+
+    pending = _drop_fined(fine_docs, window)
+    raced = set()
+    if pending:
+        try:
+            mongo.db.fines.insert_many(pending, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate-key races are expected; anything else is a real failure
+            if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+                raise
+            raced = {err["index"] for err in e.details["writeErrors"]}
+
+    created = [fine_doc for i, fine_doc in enumerate(pending) if i not in raced]
+    record_fines_issued(created)
+    record_ledger_issued(created)
+
+    # Fines that lost a race still owe their other violations
+    for i in raced:
+        pending[i].pop("_id", None)
+        if issue_fine(pending[i]):
+            created.append(pending[i])
+
+    created_ids = {id(fine_doc) for fine_doc in created}
+    return [i for i, fine_doc in enumerate(fine_docs) if id(fine_doc) in created_ids]
+
+
+def fine_link(host_url, access_token):
+    return f"{host_url}api/admin/user/fine?token={access_token}"
+
+
+def notify_fine(vehicle, total_amount, link):
+    if vehicle.get("mobile_number"):
+        send_sms_via_twilio(
+            vehicle["mobile_number"],
+            f"Fine ₹{total_amount} issued for vehicle {vehicle['vehicle_no']}. Pay here: {link}"
+        )
+
+
+def fine_vehicle(vehicle, host_url, now=None):
+    """
+    Issue a fine for the vehicle's current violations, if any, and text
+    the owner a payment link. Returns None when there is nothing to fine,
+    else {total_amount, violations, link, already_imposed, amount_due}.
+    """
+    now = now or datetime.utcnow()
+
+    # Token handling
+    access_token = ensure_access_token(vehicle)
+
+    compliance = current_compliance(vehicle, now)
+    violations, total_amount = compliance["violations"], compliance["total_amount"]
+
+    # If no violations → no fine
+    if not violations:
+        return None
+
+    fine_doc = build_fine_doc(vehicle, violations, total_amount, now)
+    created = issue_fine(fine_doc)
+
+    user_link = fine_link(host_url, access_token)
+
+    # Send SMS only for a new fine, not for a repeat read in the dedup window.
+    # The new fine covers only violations not already fined in the window.
+    if created:
+        violations, total_amount = fine_doc["violations"], fine_doc["total_amount"]
+        notify_fine(vehicle, total_amount, user_link)
+        amount_due = total_amount
+    else:
+        # Already fined in the window: only what is still unpaid is due
+        keys = dedup_keys({**fine_doc, "violations": violations}, current_app.config["FINE_DEDUP_WINDOW_SECONDS"])
+        amount_due = sum(fine["total_amount"] for fine in mongo.db.fines.find(
+            {"dedup_keys": {"$in": keys}, "status": "UNPAID"}, {"total_amount": 1}
+        ))
+
+    return {
+        "total_amount": total_amount,
+        "violations": violations,
+        "link": user_link,
+        "already_imposed": not created,
+        "amount_due": amount_due
+    }
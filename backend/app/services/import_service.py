@@ -0,0 +1,149 @@
+import csv
+import json
+from datetime import datetime
+
+from pymongo.errors import BulkWriteError
+
+from app.extensions import mongo
+from app.models import Vehicle
+from app.services.compliance_service import compute_compliance
+from app.services.vehicle_cache import vehicle_cache
+from app.utils.batch import Progress
+from app.utils.validators import validate_vehicle
+
+
+# =====================================================
+# BULK VEHICLE IMPORT
+# =====================================================
+# Rows are read, validated and written one chunk at a time, so a file of
+# any size is imported in constant memory. Each chunk is one
+# insert_many(ordered=False): a row rejected by the database (usually an
+# RFID tag that is already registered) is reported and the rest of the
+# chunk is still written.
+
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename=None, content_type=None):
+    """
+    "csv" or "ndjson" from a file name or content type, else None.
+    """
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonlines" in content_type:
+        return "ndjson"
+    return None
+
+
+def read_rows(lines, fmt):
+    """
+    Yield (line number, row dict or None, parse error or None) from a text
+    stream. Empty CSV cells are treated as absent.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "More values than header columns"
+                continue
+            yield reader.line_num, {k.strip(): v for k, v in row.items() if k and v not in (None, "")}, None
+        return
+
+    for line_no, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except ValueError as e:
+            yield line_no, None, f"Invalid JSON: {e}"
+
+
+class ImportReport:
+    """
+    Counts and per-row errors of one import. Only the first `max_errors`
+    errors are kept; `on_error` sees every one of them.
+    """
+
+    def __init__(self, max_errors=1000, on_error=None):
+        self.max_errors = max_errors
+        self.on_error = on_error
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+
+    def error(self, line, errors):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+        if self.on_error:
+            self.on_error(line, errors)
+
+    def summary(self):
+        return {
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "errors_truncated": self.invalid + self.duplicates > len(self.errors)
+        }
+
+
+def _insert_chunk(chunk, report):
+    """
+    chunk: [(line number, vehicle document)]
+    """
+    docs = [doc for _, doc in chunk]
+    failed = set()
+    try:
+        mongo.db.vehicles.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for err in e.details["writeErrors"]:
+            line, doc = chunk[err["index"]]
+            failed.add(err["index"])
+            if err["code"] == 11000:
+                report.duplicates += 1
+                report.error(line, {"rfid_tag": f"RFID tag {doc['rfid_tag']} is already registered"})
+            else:
+                report.invalid += 1
+                report.error(line, {"_": err.get("errmsg", "Write failed")})
+
+    report.inserted += len(docs) - len(failed)
+    # Drop cached "unknown tag" misses for the new vehicles
+    vehicle_cache.invalidate(*(doc["rfid_tag"] for i, doc in enumerate(docs) if i not in failed))
+
+
+def import_vehicles(rows, chunk_size=1000, max_errors=1000, report=None, on_error=None):
+    """
+    Validate and insert vehicles from read_rows(). Returns the import
+    summary merged with the processed count and rows per second.
+    """
+    result = ImportReport(max_errors, on_error)
+    progress = Progress(report)
+    chunk = []
+
+    for line, row, parse_error in rows:
+        progress.add(1, inserted=result.inserted, duplicates=result.duplicates, invalid=result.invalid)
+        if parse_error:
+            result.invalid += 1
+            result.error(line, {"_": parse_error})
+            continue
+
+        vehicle, errors = validate_vehicle(row)
+        if errors:
+            result.invalid += 1
+            result.error(line, errors)
+            continue
+
+        vehicle["created_at"] = datetime.utcnow()
+        vehicle["compliance"] = compute_compliance(vehicle)
+        vehicle.update(Vehicle.search_fields(vehicle))
+        chunk.append((line, vehicle))
+        if len(chunk) >= chunk_size:
+            _insert_chunk(chunk, result)
+            chunk = []
+
+    if chunk:
+        _insert_chunk(chunk, result)
+    return progress.summary(**result.summary())
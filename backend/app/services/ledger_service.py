@@ -0,0 +1,216 @@
+import heapq
+from datetime import datetime
+
+from flask import current_app
+from pymongo import UpdateOne
+
+from app.extensions import mongo
+from app.models import Fine
+from app.utils.batch import load_checkpoint, save_checkpoint, replace_untouched, delete_unrebuilt, Progress
+
+
+# =====================================================
+# FINE LEDGERS
+# =====================================================
+# One document per vehicle in "fine_ledgers" (_id = vehicle_no) holding
+# what the user portal shows: counts by status, the running totals and the
+# most recent fines, newest first. It is updated with $inc/$push as fines
+# are issued and paid, so the portal reads one document by token or
+# vehicle number instead of every fine of the vehicle. Ledgers are built
+# by `flask stats ledgers`, never inside a request.
+
+LEDGERS_JOB = "fine_ledgers"
+
+VEHICLE_FIELDS = ("vehicle_no", "owner_name", "rfid_tag")
+
+
+def ledger_entry(fine):
+    """
+    The portal's view of one fine.
+    """
+    entry = {
+        "_id": fine["_id"],
+        "issued_at": fine["issued_at"],
+        "status": fine["status"],
+        "violations": fine["violations"],
+        "total_amount": fine["total_amount"]
+    }
+    if fine.get("paid_at"):
+        entry["paid_at"] = fine["paid_at"]
+    return entry
+
+
+def _recent_limit():
+    return current_app.config["LEDGER_RECENT_FINES"]
+
+
+def _vehicle_fields(fine):
+    fields = {field: fine[field] for field in VEHICLE_FIELDS + ("token",) if fine.get(field)}
+    fields["updated_at"] = datetime.utcnow()
+    return fields
+
+
+def record_ledger_issued(fines):
+    """
+    Add new fines to their vehicles' ledgers, creating ledgers as needed.
+    """
+    ops = []
+    for fine in fines:
+        if not fine.get("vehicle_no"):
+            continue
+        entry = ledger_entry(fine)
+        inc = {"total_fines": 1, "total_amount": entry["total_amount"], f"counts.{entry['status']}": 1}
+        if entry["status"] == "UNPAID":
+            inc["unpaid_amount"] = entry["total_amount"]
+        ops.append(UpdateOne(
+            {"_id": fine["vehicle_no"]},
+            {
+                "$inc": inc,
+                "$set": _vehicle_fields(fine),
+                "$push": {"recent": {"$each": [entry], "$sort": {"issued_at": -1}, "$slice": _recent_limit()}}
+            },
+            upsert=True
+        ))
+    if ops:
+        mongo.db.fine_ledgers.bulk_write(ops)
+
+
+def record_ledger_paid(fines, paid_at):
+    """
+    Move paid fines from the unpaid to the paid side of their ledgers.
+    `fines` are fines that were UNPAID until this payment.
+    """
+    by_vehicle = {}
+    for fine in fines:
+        if fine.get("vehicle_no"):
+            by_vehicle.setdefault(fine["vehicle_no"], []).append(ledger_entry(fine))
+
+    ops = []
+    for vehicle_no, entries in by_vehicle.items():
+        amount = sum(e["total_amount"] for e in entries)
+        ops.append(UpdateOne(
+            {"_id": vehicle_no},
+            {
+                "$inc": {"counts.UNPAID": -len(entries), "counts.PAID": len(entries), "unpaid_amount": -amount},
+                "$set": {
+                    "recent.$[paid].status": "PAID",
+                    "recent.$[paid].paid_at": paid_at,
+                    "updated_at": datetime.utcnow()
+                }
+            },
+            array_filters=[{"paid._id": {"$in": [e["_id"] for e in entries]}}]
+        ))
+    if ops:
+        mongo.db.fine_ledgers.bulk_write(ops)
+
+
+def _new_ledger(vehicle_no):
+    return {
+        "_id": vehicle_no, "vehicle_no": vehicle_no, "total_fines": 0, "total_amount": 0,
+        "unpaid_amount": 0, "counts": {}, "recent": []
+    }
+
+
+def _add_fine(ledger, heap, fine, limit):
+    entry = ledger_entry(fine)
+    status = entry["status"]
+    ledger["total_fines"] += 1
+    ledger["total_amount"] += entry["total_amount"]
+    ledger["counts"][status] = ledger["counts"].get(status, 0) + 1
+    if status == "UNPAID":
+        ledger["unpaid_amount"] += entry["total_amount"]
+    ledger.update({k: v for k, v in _vehicle_fields(fine).items() if k != "updated_at"})
+
+    item = (entry["issued_at"], entry["_id"], entry)
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item[:2] > heap[0][:2]:
+        heapq.heapreplace(heap, item)
+
+
+def _fines_by_vehicle(query, batch_size=1000):
+    projection = {"vehicle_no": 1, "owner_name": 1, "rfid_tag": 1, "token": 1, "status": 1,
+                  "issued_at": 1, "paid_at": 1, "violations": 1, "total_amount": 1}
+    return mongo.db.fines.find(
+        {"$and": [{"vehicle_no": {"$type": "string"}}, Fine.CANONICAL_QUERY, query]}, projection,
+        batch_size=batch_size
+    ).sort("vehicle_no", 1)
+
+
+def _ledgers_from(fines, limit):
+    """
+    Yield one ledger per vehicle from fines sorted by vehicle_no, keeping
+    only the newest `limit` fines of each in memory.
+    """
+    ledger = heap = None
+    for fine in fines:
+        if ledger is None or ledger["_id"] != fine["vehicle_no"]:
+            if ledger is not None:
+                yield _finish_ledger(ledger, heap)
+            ledger, heap = _new_ledger(fine["vehicle_no"]), []
+        _add_fine(ledger, heap, fine, limit)
+    if ledger is not None:
+        yield _finish_ledger(ledger, heap)
+
+
+def _finish_ledger(ledger, heap):
+    ledger["recent"] = [entry for _, _, entry in sorted(heap, reverse=True)]
+    return ledger
+
+
+def rebuild_ledgers(batch_size=1000, report=None):
+    """
+    Recompute every ledger from the fines collection. Streams the fines in
+    vehicle_no order and replaces the ledgers in place, in batches, so the
+    portal keeps working meanwhile. A ledger that received a live update
+    after its fines were read is recomputed from that vehicle's fines.
+    """
+    limit = _recent_limit()
+    progress = Progress(report)
+    started = datetime.utcnow()
+    pending, skipped, written = [], [], 0
+
+    def flush():
+        nonlocal pending, written
+        missed = replace_untouched(mongo.db.fine_ledgers, pending, started)
+        skipped.extend(missed)
+        written += len(pending) - len(missed)
+        pending = []
+
+    for ledger in _ledgers_from(_fines_by_vehicle({}, batch_size), limit):
+        pending.append(ledger)
+        if len(pending) >= batch_size:
+            flush()
+        progress.add(ledger["total_fines"], ledgers=written)
+    flush()
+
+    while skipped:
+        since = datetime.utcnow()
+        retry = list(_ledgers_from(_fines_by_vehicle({"vehicle_no": {"$in": skipped}}), limit))
+        skipped = replace_untouched(mongo.db.fine_ledgers, retry, since)
+        written += len(retry) - len(skipped)
+
+    delete_unrebuilt(mongo.db.fine_ledgers, started)
+    save_checkpoint(LEDGERS_JOB, built_at=datetime.utcnow())
+    return progress.summary(ledgers=written)
+
+
+def get_ledger(token=None, vehicle_no=None):
+    """
+    The ledger for a portal token or a vehicle number, or None. Until the
+    ledgers are built, it is computed from that vehicle's fines instead.
+    """
+    if load_checkpoint(LEDGERS_JOB):
+        query = {"token": token} if token else {"_id": vehicle_no}
+        return mongo.db.fine_ledgers.find_one(query)
+
+    query = {"token": token} if token else {"vehicle_no": vehicle_no}
+    return next(_ledgers_from(_fines_by_vehicle(query), _recent_limit()), None)
+
+
+def ledger_fines(ledger):
+    """
+    The ledger's recent fines in the shape the portal renders.
+    """
+    vehicle = {field: ledger.get(field) for field in VEHICLE_FIELDS}
+    return [{**entry, **vehicle, "_id": str(entry["_id"])} for entry in ledger.get("recent", [])]
@@ -0,0 +1,202 @@
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from flask import current_app
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.extensions import mongo
+from app.services.stats_service import record_fines_paid
+from app.services.ledger_service import record_ledger_paid
+from app.services.twilio_service import send_sms_via_twilio
+
+
+# =====================================================
+# PAYMENTS
+# =====================================================
+# A payment is identified by (token, idempotency_key) and recorded as a
+# receipt in the "payments" collection:
+#
+#   1. claim     insert the receipt as PENDING with a fresh claim_id; the
+#                unique index makes a retry with the same key find the
+#                existing receipt instead. A retry takes over a stale claim
+#                only by swapping its claim_id/created_at atomically
+#   2. settle    one conditional update_many: UNPAID fines of the token
+#                become PAID and are stamped with the receipt id, so two
+#                racing payments can never settle the same fine
+#   3. apply     update the counters, then the ledger; a step runs only
+#                for the request that adds it to the receipt's "applied"
+#                list, and is removed again if it fails
+#   4. complete  PENDING -> COMPLETED with the settled total; only the
+#                request that wins this transition queues the SMS
+#
+# Every step can be re-run for the same receipt, so a request that died
+# half-way is finished by the next retry once the claim is stale; steps
+# in "applied" are never run twice, even by overlapping requests.
+
+
+class PaymentInProgress(Exception):
+    pass
+
+
+class NothingToPay(Exception):
+    pass
+
+
+def _receipt_view(receipt, replayed):
+    return {
+        "receipt_id": str(receipt["_id"]),
+        "total_paid": receipt["total_paid"],
+        "fines_cleared": receipt["fines_cleared"],
+        "payment_method": receipt.get("payment_method"),
+        "paid_at": receipt.get("completed_at"),
+        "replayed": replayed
+    }
+
+
+def _claim(token, idempotency_key, payment_method):
+    """
+    Return (receipt, claimed). claimed is False when the key was used before.
+    """
+    receipt = {
+        "token": token,
+        "idempotency_key": idempotency_key,
+        "payment_method": payment_method,
+        "status": "PENDING",
+        "claim_id": ObjectId(),
+        "created_at": datetime.utcnow()
+    }
+    # A second pass covers a receipt deleted (NothingToPay) between the
+    # insert and the lookup
+    for _ in range(2):
+        try:
+            mongo.db.payments.insert_one(receipt)
+            return receipt, True
+        except DuplicateKeyError:
+            existing = mongo.db.payments.find_one({"token": token, "idempotency_key": idempotency_key})
+            if existing is not None:
+                return existing, False
+    raise PaymentInProgress()
+
+
+def _take_over(receipt):
+    """
+    Re-claim a stale PENDING receipt. Returns None when another request
+    re-claimed or completed it first.
+    """
+    return mongo.db.payments.find_one_and_update(
+        {"_id": receipt["_id"], "status": "PENDING",
+         "claim_id": receipt.get("claim_id"), "created_at": receipt["created_at"]},
+        {"$set": {"claim_id": ObjectId(), "created_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _settle(receipt):
+    # Once a step has been applied the settled set is final: fines issued
+    # since then belong to the next payment
+    if not receipt.get("applied"):
+        mongo.db.fines.update_many(
+            {"token": receipt["token"], "status": "UNPAID"},
+            {"$set": {
+                "status": "PAID",
+                "paid_at": datetime.utcnow(),
+                "payment_method": receipt["payment_method"],
+                "receipt_id": receipt["_id"]
+            }}
+        )
+    # Everything this receipt settled, including on an earlier attempt
+    return list(mongo.db.fines.find(
+        {"receipt_id": receipt["_id"]},
+        {"total_amount": 1, "issued_at": 1, "violations": 1, "status": 1,
+         "vehicle_no": 1, "mobile_number": 1, "paid_at": 1}
+    ))
+
+
+def _apply(receipt, fines):
+    """
+    Move the settled fines to the paid side of the counters and ledger.
+    Each step is first added to the receipt's "applied" list, and runs only
+    if this request added it; a failed step is taken out again so the next
+    retry runs it.
+    """
+    steps = (
+        ("counters", lambda: record_fines_paid(fines)),
+        ("ledger", lambda: record_ledger_paid(fines, fines[0]["paid_at"]))
+    )
+    for name, step in steps:
+        marked = mongo.db.payments.update_one(
+            {"_id": receipt["_id"], "applied": {"$ne": name}},
+            {"$addToSet": {"applied": name}}
+        )
+        if not marked.modified_count:
+            continue
+        try:
+            step()
+        except Exception:
+            mongo.db.payments.update_one({"_id": receipt["_id"]}, {"$pull": {"applied": name}})
+            raise
+
+
+def _notify(fines, total_paid):
+    mobile_number = next((f["mobile_number"] for f in fines if f.get("mobile_number")), None)
+    if not mobile_number:
+        return False
+    return send_sms_via_twilio(
+        mobile_number,
+        f"Payment of ₹{total_paid} for vehicle {fines[0].get('vehicle_no')} successful. All fines cleared!"
+    )
+
+
+def pay_fines(token, idempotency_key, payment_method="upi"):
+    """
+    Pay every unpaid fine of the vehicle behind `token`. Returns
+    (receipt view, sms_queued). Repeating the call with the same key returns
+    the original receipt with replayed=True and does nothing else.
+
+    Raises PaymentInProgress while another request holds a fresh claim on
+    the key, and NothingToPay when there were no unpaid fines.
+    """
+    receipt, claimed = _claim(token, idempotency_key, payment_method)
+
+    if not claimed:
+        if receipt["status"] == "COMPLETED":
+            return _receipt_view(receipt, replayed=True), False
+        stale_after = timedelta(seconds=current_app.config["PAYMENT_CLAIM_TIMEOUT_SECONDS"])
+        if receipt["created_at"] > datetime.utcnow() - stale_after:
+            raise PaymentInProgress()
+        taken = _take_over(receipt)
+        if taken is None:
+            current = mongo.db.payments.find_one({"_id": receipt["_id"]})
+            if current and current["status"] == "COMPLETED":
+                return _receipt_view(current, replayed=True), False
+            raise PaymentInProgress()
+        receipt = taken
+
+    fines = _settle(receipt)
+    if not fines:
+        mongo.db.payments.delete_one({"_id": receipt["_id"], "status": "PENDING", "claim_id": receipt["claim_id"]})
+        raise NothingToPay()
+
+    _apply(receipt, fines)
+
+    total_paid = sum(f["total_amount"] for f in fines)
+    completed = mongo.db.payments.find_one_and_update(
+        {"_id": receipt["_id"], "status": "PENDING"},
+        {"$set": {
+            "status": "COMPLETED",
+            "total_paid": total_paid,
+            "fines_cleared": len(fines),
+            "fine_ids": [f["_id"] for f in fines],
+            "vehicle_no": fines[0].get("vehicle_no"),
+            "completed_at": datetime.utcnow()
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    if completed is None:
+        # A concurrent retry of the same payment completed it first
+        receipt = mongo.db.payments.find_one({"_id": receipt["_id"]})
+        return _receipt_view(receipt, replayed=True), False
+
+    sms_queued = _notify(fines, total_paid)
+    return _receipt_view(completed, replayed=False), sms_queued
@@ -0,0 +1,104 @@
+import threading
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+
+# Upper bounds (ms) of the checkout wait histogram; the last bucket is +Inf
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Records how long requests wait to check a connection out of the
+    MongoClient pool. Registered through event_listeners on the client, so
+    it sees every pool the client opens (one per server).
+
+    A growing tail in the histogram, or checkout failures with reason
+    "timeout", means gate traffic is queuing for connections and
+    MONGO_MAX_POOL_SIZE is too small for the worker concurrency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = {}
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.checked_out = 0
+            self.open_connections = 0
+            self.pools_cleared = 0
+
+    # ---- listener callbacks (called on driver threads) ----
+
+    def connection_checked_out(self, event):
+        wait = event.duration
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            self.wait_buckets[bisect_left(WAIT_BUCKETS_MS, wait * 1000)] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            buckets = {}
+            cumulative = 0
+            for bound, count in zip(WAIT_BUCKETS_MS + ("+Inf",), self.wait_buckets):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            return {
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "checked_out": self.checked_out,
+                "open_connections": self.open_connections,
+                "pools_cleared": self.pools_cleared,
+                "avg_wait_ms": round(self.wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else None,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+                # Cumulative counts of checkouts that waited <= bucket ms
+                "wait_ms_buckets": buckets
+            }
+
+
+pool_monitor = PoolMonitor()
@@ -0,0 +1,208 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app.extensions import mongo
+from app.models import Vehicle, as_datetime, format_date
+
+
+# =====================================================
+# RULE COMPILATION
+# =====================================================
+# A rule is a plain document, stored in the "violation_rules" collection
+# or, when that collection is empty, in Config.VIOLATION_RULES:
+#
+#   {"code": "PUC", "type": "PUC Expired", "field": "puc_expiry",
+#    "condition": "expired", "fine": 500, "grace_days": 0, "enabled": true}
+#
+# `field` is one of Vehicle.DATE_FIELDS; fine and grace_days are whole
+# non-negative numbers. Conditions:
+#   expired  the date in `field` plus grace_days is in the past
+#   missing  `field` is absent or empty
+
+CONDITIONS = ("expired", "missing")
+
+
+def _whole_amount(value, name):
+    # int() would silently drop a fraction (499.5 -> 499)
+    if (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0
+            or isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be a whole non-negative number")
+    return int(value)
+
+
+class CompiledRule:
+    __slots__ = ("code", "type", "field", "condition", "fine", "grace")
+
+    def __init__(self, rule):
+        self.field = rule["field"]
+        self.code = rule.get("code") or str(self.field).upper()
+        self.type = rule["type"]
+        self.condition = rule["condition"]
+
+        if self.field not in Vehicle.DATE_FIELDS:
+            raise ValueError(f"Unknown field {self.field!r}, expected one of {', '.join(Vehicle.DATE_FIELDS)}")
+        if not isinstance(self.code, str) or not isinstance(self.type, str) or not self.type:
+            raise ValueError("code and type must be strings")
+        if self.condition not in CONDITIONS:
+            raise ValueError(f"Unknown condition {self.condition!r}")
+        self.fine = _whole_amount(rule["fine"], "fine")
+        self.grace = timedelta(days=_whole_amount(rule.get("grace_days", 0), "grace_days"))
+
+    def violation(self, value):
+        return {"code": self.code, "type": self.type, "expired_on": format_date(value), "fine": self.fine}
+
+
+def compile_rules(rules):
+    """
+    Compile rule documents, skipping disabled ones. Raises ValueError on
+    the first invalid rule.
+    """
+    compiled = []
+    for rule in rules:
+        if not rule.get("enabled", True):
+            continue
+        try:
+            compiled.append(CompiledRule(rule))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid rule {rule.get('code') or rule.get('field')}: {e}")
+    return compiled
+
+
+# =====================================================
+# ENGINE
+# =====================================================
+
+class RuleEngine:
+    """
+    Holds the compiled rule set. Rules are loaded from Mongo on first use
+    and re-read at most every RULES_RELOAD_SECONDS; they are recompiled
+    only when the stored documents actually changed.
+    """
+
+    def __init__(self):
+        self.default_rules = []
+        self.reload_seconds = 30
+        self._rules = None
+        self._source = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.version = None
+
+    def init_app(self, app):
+        self.default_rules = app.config.get("VIOLATION_RULES", [])
+        self.reload_seconds = app.config.get("RULES_RELOAD_SECONDS", 30)
+        self._rules = None
+        self._source = None
+        self._checked_at = 0.0
+
+    def _stored_rules(self):
+        stored = list(mongo.db.violation_rules.find({}, {"_id": 0}).sort("code", 1))
+        return stored or self.default_rules
+
+    def reload(self, force=False):
+        if not force and self._rules is not None and time.monotonic() - self._checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            source = self._stored_rules()
+            self._checked_at = time.monotonic()
+            if source == self._source and self._rules is not None:
+                return
+            try:
+                self._rules = compile_rules(source)
+            except ValueError as e:
+                current_app.logger.error("Keeping previous violation rules: %s", e)
+                if self._rules is not None:
+                    return
+                source = self.default_rules
+                self._rules = compile_rules(source)
+            self._source = source
+            # Stored compliance records the version it was computed with
+            self.version = hashlib.sha1(repr(source).encode()).hexdigest()[:12]
+
+    @property
+    def rules(self):
+        self.reload()
+        return self._rules
+
+    def current_version(self):
+        self.reload()
+        return self.version
+
+    def evaluate(self, vehicle, now=None):
+        """
+        Evaluate one vehicle. Returns (violations, total_amount, next_change)
+        where next_change is the earliest future moment the result can flip.
+        """
+        return self.evaluate_many([vehicle], now)[0]
+
+    def evaluate_many(self, vehicles, now=None):
+        """
+        Evaluate a batch in one pass: per-rule thresholds are computed once
+        and each vehicle is then a handful of field comparisons.
+        """
+        now = now or datetime.utcnow()
+        rules = [(rule, now - rule.grace) for rule in self.rules]
+        results = []
+
+        for vehicle in vehicles:
+            violations = []
+            total_amount = 0
+            next_change = None
+
+            for rule, threshold in rules:
+                value = vehicle.get(rule.field)
+                if rule.condition == "missing":
+                    if value in (None, ""):
+                        violations.append(rule.violation(None))
+                        total_amount += rule.fine
+                    continue
+
+                expiry = as_datetime(value)
+                if expiry is None:
+                    continue
+                if expiry < threshold:
+                    violations.append(rule.violation(value))
+                    total_amount += rule.fine
+                else:
+                    flips_at = expiry + rule.grace
+                    if next_change is None or flips_at < next_change:
+                        next_change = flips_at
+
+            results.append((violations, total_amount, next_change))
+        return results
+
+    def violated_fields(self, violations):
+        """
+        The vehicle fields behind a list of violations from evaluate().
+        """
+        fields = {rule.code: rule.field for rule in self.rules}
+        return {fields.get(v["code"]) for v in violations}
+
+    def describe(self):
+        return [
+            {"code": r.code, "type": r.type, "field": r.field, "condition": r.condition,
+             "fine": r.fine, "grace_days": r.grace.days}
+            for r in self.rules
+        ]
+
+
+rule_engine = RuleEngine()
+
+
+def replace_rules(rules):
+    """
+    Validate and store a new rule set, then reload it in this process.
+    Other processes pick it up within RULES_RELOAD_SECONDS.
+    """
+    # An empty collection means "use Config.VIOLATION_RULES", so an empty
+    # set can't be stored; rules are switched off with "enabled": false
+    if not rules:
+        raise ValueError("At least one rule is required; disable rules with \"enabled\": false")
+    compile_rules(rules)  # raises ValueError before anything is written
+    mongo.db.violation_rules.delete_many({})
+    mongo.db.violation_rules.insert_many([dict(rule) for rule in rules])
+    rule_engine.reload(force=True)
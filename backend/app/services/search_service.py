@@ -0,0 +1,111 @@
+from app.extensions import read_db
+from app.models import Vehicle, search_key, trigrams
+
+
+# =====================================================
+# VEHICLE TYPE-AHEAD
+# =====================================================
+# Vehicles carry normalized copies of their plate and tag (plate_key,
+# tag_key: upper-case, letters and digits only) and the plate's trigrams
+# (plate_grams), see Vehicle.search_fields. A prefix search is an anchored
+# regex on a normalized key, i.e. a bounded range scan of its index that
+# stops after `limit` entries however many vehicles match.
+
+DEFAULT_FIELDS = {"vehicle_no": 1, "rfid_tag": 1, "owner_name": 1, "model_no": 1}
+# ?fields= may only pick from the vehicle's own fields: never the access
+# token, compliance snapshot or search keys
+ALLOWED_FIELDS = Vehicle.FIELDS
+
+
+def _prefix(collection, field, key, projection, limit):
+    return list(
+        collection.find({field: {"$regex": f"^{key}"}}, projection).sort(field, 1).limit(limit)
+    )
+
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+
+def _rarest_grams(collection, grams, budget):
+    """
+    The query's trigrams that fewest plates share, adding rarer ones first
+    while their plates fit in `budget`. Each count stops at `budget` index
+    entries, so a common gram ("MH1") costs no more than a rare one.
+    Grams no plate has (usually the ones around a typo) are left out.
+    """
+    counts = sorted(
+        (collection.count_documents({"plate_grams": gram}, limit=budget), gram) for gram in grams
+    )
+    selected = []
+    for count, gram in counts:
+        if not count:
+            continue
+        if count > budget and selected:
+            break
+        selected.append(gram)
+        budget -= count
+    return selected
+
+
+def _fuzzy(collection, key, projection, limit, candidates, min_score):
+    """
+    Plates sharing trigrams with the query, best overlap first. Candidates
+    are the plates holding the query's rarest trigrams (at most
+    `candidates` of them), which a near-miss of the query almost always
+    shares; common grams alone would pick plates in index order.
+    """
+    grams = set(trigrams(key))
+    if not grams:
+        return []
+    selected = _rarest_grams(collection, sorted(grams), candidates)
+    if not selected:
+        return []
+    docs = collection.find({"plate_grams": {"$in": selected}},
+                           {**projection, "plate_grams": 1}).limit(candidates)
+    scored = []
+    for doc in docs:
+        score = _dice(grams, set(doc.pop("plate_grams", [])))
+        if score >= min_score:
+            scored.append((score, doc))
+    scored.sort(key=lambda item: -item[0])
+    return [doc for _, doc in scored[:limit]]
+
+
+def search_vehicles(query, limit=10, fields=None, fuzzy=False, candidates=200, min_score=0.5):
+    """
+    Vehicles whose plate, then tag, starts with `query` (normalized), up to
+    `limit`. With fuzzy=True, remaining slots are filled with plates that
+    merely resemble the query. Each result is serialized (string _id,
+    "YYYY-MM-DD" dates) and has "match": "plate", "tag" or "fuzzy".
+
+    Raises ValueError for a field outside ALLOWED_FIELDS.
+    """
+    unknown = sorted(set(fields or ()) - set(ALLOWED_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    key = search_key(query)
+    if not key:
+        return []
+
+    collection = read_db().vehicles
+    projection = dict(fields or DEFAULT_FIELDS)
+    results, seen = [], set()
+
+    passes = [
+        ("plate", lambda n: _prefix(collection, "plate_key", key, projection, n)),
+        ("tag", lambda n: _prefix(collection, "tag_key", key, projection, n)),
+    ]
+    if fuzzy:
+        passes.append(("fuzzy", lambda n: _fuzzy(collection, key, projection, n, candidates, min_score)))
+
+    for match, run in passes:
+        if len(results) >= limit:
+            break
+        # A full `limit` per pass: some rows may repeat earlier passes
+        for doc in run(limit):
+            if doc["_id"] in seen or len(results) >= limit:
+                continue
+            seen.add(doc["_id"])
+            results.append({**Vehicle.serialize(doc), "match": match})
+    return results
@@ -0,0 +1,298 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+from app.log import mask_phone
+from app.metrics import SMS_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+def to_e164(mobile_number, default_country_code="+91"):
+    mobile_number = str(mobile_number).strip()
+    if not mobile_number.startswith("+"):
+        return default_country_code + mobile_number
+    return mobile_number
+
+
+# =====================================================
+# TRANSPORTS
+# =====================================================
+
+class TwilioTransport:
+    """
+    Sends through Twilio. The client is created once, on first use, so
+    importing the app doesn't pay for the twilio import.
+    """
+
+    def __init__(self, account_sid, auth_token, from_number):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def send(self, to, body):
+        return self.client.messages.create(body=body, from_=self.from_number, to=to).sid
+
+
+class FileTransport:
+    """
+    Appends each message as a JSON line to a local file instead of sending it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, to, body):
+        line = json.dumps({"to": to, "body": body, "sent_at": datetime.utcnow().isoformat()})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class StubTransport:
+    """
+    Keeps messages in memory; handy in tests and local development.
+    """
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, to, body):
+        self.sent.append((to, body))
+
+
+# =====================================================
+# CIRCUIT BREAKER
+# =====================================================
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects sends until
+    `reset_timeout` seconds have passed, then lets one trial send through.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            if self.state != "half_open":
+                return self.state == "closed"
+            # Re-arm the timer so only one trial send goes through
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+# =====================================================
+# DISPATCHER
+# =====================================================
+
+class SmsDispatcher:
+    """
+    Bounded queue drained by a small pool of worker threads, so request
+    handlers only pay for an enqueue. Workers start on the first message.
+    """
+
+    def __init__(self):
+        self.transport = StubTransport()
+        self.breaker = CircuitBreaker()
+        self.async_send = True
+        self.workers = 2
+        self.max_retries = 3
+        self.retry_backoff = 0.5
+        self._queue = queue.Queue(maxsize=1000)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_counters()
+
+    def init_app(self, app):
+        config = app.config
+        self.transport = self.create_transport(config)
+        self.breaker = CircuitBreaker(
+            config.get("SMS_BREAKER_THRESHOLD", 5),
+            config.get("SMS_BREAKER_RESET_SECONDS", 30)
+        )
+        self.async_send = config.get("SMS_ASYNC", True)
+        self.workers = config.get("SMS_WORKERS", 2)
+        self.max_retries = config.get("SMS_MAX_RETRIES", 3)
+        self.retry_backoff = config.get("SMS_RETRY_BACKOFF", 0.5)
+        self._queue = queue.Queue(maxsize=config.get("SMS_QUEUE_SIZE", 1000))
+        self._threads = []
+        self._reset_counters()
+
+    @staticmethod
+    def create_transport(config):
+        name = config.get("SMS_TRANSPORT", "twilio")
+        if name == "twilio":
+            return TwilioTransport(
+                config.get("TWILIO_ACCOUNT_SID"),
+                config.get("TWILIO_AUTH_TOKEN"),
+                config.get("TWILIO_FROM_NUMBER")
+            )
+        if name == "file":
+            return FileTransport(config.get("SMS_FILE_PATH", "sms_outbox.jsonl"))
+        if name == "stub":
+            return StubTransport()
+        raise ValueError(f"Unknown SMS_TRANSPORT: {name}")
+
+    def _reset_counters(self):
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _incr(self, counter, amount=1):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"sms-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, mobile_number, body):
+        """
+        Queue a message for delivery. Returns False if it was dropped
+        because the queue is full.
+        """
+        message = (to_e164(mobile_number), body)
+
+        if not self.async_send:
+            # Inline sends hold up the request: one attempt, no backoff
+            self._incr("enqueued")
+            return self._deliver(*message, retries=0)
+
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self._incr("dropped")
+            logger.warning("SMS dropped: queue full", extra={"fields": {"to": mask_phone(message[0])}})
+            return False
+
+        self._incr("enqueued")
+        self._ensure_workers()
+        return True
+
+    def _work(self):
+        while True:
+            to, body = self._queue.get()
+            try:
+                self._deliver(to, body)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, to, body, retries=None):
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            if not self.breaker.allow():
+                self._incr("rejected")
+                logger.warning("SMS rejected: circuit open", extra={"fields": {"to": mask_phone(to)}})
+                return False
+
+            started = time.perf_counter()
+            try:
+                self.transport.send(to, body)
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt == retries:
+                    self._incr("failed")
+                    logger.warning("SMS delivery failed", extra={"fields": {
+                        "to": mask_phone(to), "attempts": attempt + 1,
+                        # Provider messages can quote the number; log the type only
+                        "error": type(e).__name__
+                    }})
+                    return False
+                self._incr("retried")
+                # Exponential backoff with jitter
+                time.sleep(self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+                continue
+
+            elapsed = time.perf_counter() - started
+            self.breaker.record_success()
+            with self._stats_lock:
+                self.sent += 1
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+            SMS_LATENCY.observe(elapsed)
+            return True
+
+    def drain(self, timeout=None):
+        """
+        Wait until every queued message has been processed (or timeout).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "transport": type(self.transport).__name__,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "workers": len(self._threads),
+                "enqueued": self.enqueued,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+                "dropped": self.dropped,
+                "rejected_by_breaker": self.rejected,
+                "breaker_state": self.breaker.state,
+                "avg_send_latency_ms": round(self.latency_total / self.sent * 1000, 2) if self.sent else 0.0,
+                "max_send_latency_ms": round(self.latency_max * 1000, 2),
+            }
+
+
+sms_dispatcher = SmsDispatcher()
@@ -0,0 +1,275 @@
+from collections import defaultdict
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app.extensions import mongo, read_db
+from app.models import Fine
+from app.utils.batch import load_checkpoint, save_checkpoint, replace_untouched, delete_unrebuilt
+
+
+# Single document in the "counters" collection holding fine totals.
+# It is maintained with $inc as fines are issued and paid, so the
+# dashboard reads one document instead of scanning the fines collection.
+# It is built by `flask stats rebuild`, never inside a request.
+FINE_COUNTERS_ID = "fines"
+
+
+class StatsNotBuilt(Exception):
+    pass
+
+
+def _counters():
+    return mongo.db.counters
+
+
+def record_fines_issued(fines):
+    """
+    Update the dashboard counters and monthly rollups for new fines.
+    """
+    if not fines:
+        return
+    amount = sum(f["total_amount"] for f in fines)
+    # No upsert: until the document is bootstrapped by recompute_stats()
+    # these increments would only cover part of the history.
+    _counters().update_one(
+        {"_id": FINE_COUNTERS_ID},
+        {"$inc": {"total_fines": len(fines), "unpaid_fines": len(fines), "unpaid_amount": amount},
+         "$set": {"updated_at": datetime.utcnow()}}
+    )
+    _apply_rollups([(f, "UNPAID", 1) for f in fines])
+
+
+def record_fines_paid(fines):
+    """
+    Move paid fines from the unpaid to the paid side of the counters and
+    of the rollup for the month each fine was issued in.
+    """
+    if not fines:
+        return
+    amount = sum(f["total_amount"] for f in fines)
+    _counters().update_one(
+        {"_id": FINE_COUNTERS_ID},
+        {"$inc": {
+            "unpaid_fines": -len(fines),
+            "unpaid_amount": -amount,
+            "paid_fines": len(fines),
+            "total_revenue": amount
+        },
+         "$set": {"updated_at": datetime.utcnow()}}
+    )
+    _apply_rollups([(f, "UNPAID", -1) for f in fines] + [(f, "PAID", 1) for f in fines])
+
+
+def _counters_doc():
+    pipeline = [
+        {"$match": Fine.CANONICAL_QUERY},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "by_status": [
+                {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$total_amount"}}}
+            ]
+        }}
+    ]
+    result = next(mongo.db.fines.aggregate(pipeline))
+    by_status = {row["_id"]: row for row in result["by_status"]}
+
+    return {
+        "_id": FINE_COUNTERS_ID,
+        "total_fines": result["total"][0]["count"] if result["total"] else 0,
+        "unpaid_fines": by_status.get("UNPAID", {}).get("count", 0),
+        "unpaid_amount": by_status.get("UNPAID", {}).get("amount", 0),
+        "paid_fines": by_status.get("PAID", {}).get("count", 0),
+        "total_revenue": by_status.get("PAID", {}).get("amount", 0),
+        "recomputed_at": datetime.utcnow()
+    }
+
+
+def recompute_stats():
+    """
+    Rebuild the counters document from the fines collection in one
+    $facet aggregation and return it. The document is replaced only if no
+    live $inc landed while the totals were computed; otherwise they are
+    computed again.
+    """
+    since = datetime.utcnow()
+    counters = _counters_doc()
+    while replace_untouched(_counters(), [counters], since):
+        since = datetime.utcnow()
+        counters = _counters_doc()
+    return counters
+
+
+def get_fine_counters():
+    """
+    Raises StatsNotBuilt until recompute_stats() has run once.
+    """
+    counters = read_db().counters.find_one({"_id": FINE_COUNTERS_ID})
+    if counters is None:
+        raise StatsNotBuilt()
+    return counters
+
+
+# =====================================================
+# MONTHLY ROLLUPS
+# =====================================================
+# fine_rollups holds one document per (year, month, status):
+#   {_id: "2025-03|UNPAID", period: "2025-03", year, month, status,
+#    count, amount, by_type: {INSURANCE: {count, amount}, ...}}
+# kept current with $inc, so reports never scan the fines collection.
+# They are built by `flask stats rollups`, never inside a request.
+
+ROLLUPS_JOB = "fine_rollups"
+
+
+class RollupsNotBuilt(Exception):
+    pass
+
+
+def _type_key(violation):
+    # Field names can't contain "." or start with "$"
+    key = violation.get("code") or violation.get("type") or "OTHER"
+    return str(key).replace(".", "_").lstrip("$")
+
+
+def _apply_rollups(entries):
+    """
+    entries: (fine, status, sign) triples, applied as one bulk_write.
+    """
+    incs = defaultdict(lambda: defaultdict(int))
+    for fine, status, sign in entries:
+        issued = fine["issued_at"]
+        key = (issued.year, issued.month, status)
+        incs[key]["count"] += sign
+        incs[key]["amount"] += sign * fine["total_amount"]
+        for violation in fine["violations"]:
+            type_key = _type_key(violation)
+            incs[key][f"by_type.{type_key}.count"] += sign
+            incs[key][f"by_type.{type_key}.amount"] += sign * (violation.get("fine") or 0)
+
+    ops = []
+    for (year, month, status), inc in incs.items():
+        period = f"{year:04d}-{month:02d}"
+        ops.append(UpdateOne(
+            {"_id": f"{period}|{status}"},
+            {"$inc": dict(inc),
+             "$set": {"updated_at": datetime.utcnow()},
+             "$setOnInsert": {"period": period, "year": year, "month": month, "status": status}},
+            upsert=True
+        ))
+    if ops:
+        mongo.db.fine_rollups.bulk_write(ops, ordered=False)
+
+
+def _month_range(period):
+    year, month = map(int, period.split("-"))
+    return datetime(year, month, 1), datetime(year + month // 12, month % 12 + 1, 1)
+
+
+def _rollup_docs(match):
+    """
+    Rollup documents for the canonical fines matching `match`, keyed by _id.
+    """
+    match = {"$and": [Fine.CANONICAL_QUERY, match]}
+    group_id = {"year": {"$year": "$issued_at"}, "month": {"$month": "$issued_at"}, "status": "$status"}
+
+    totals = mongo.db.fines.aggregate([
+        {"$match": match},
+        {"$group": {"_id": group_id, "count": {"$sum": 1}, "amount": {"$sum": "$total_amount"}}}
+    ])
+    by_type = mongo.db.fines.aggregate([
+        {"$match": match},
+        {"$project": {"issued_at": 1, "status": 1, "violations": 1}},
+        {"$unwind": "$violations"},
+        {"$group": {
+            "_id": {**group_id, "type": {"$ifNull": ["$violations.code", "$violations.type"]}},
+            "count": {"$sum": 1},
+            "amount": {"$sum": {"$ifNull": ["$violations.fine", 0]}}
+        }}
+    ])
+
+    docs = {}
+    for row in totals:
+        g = row["_id"]
+        period = f"{g['year']:04d}-{g['month']:02d}"
+        _id = f"{period}|{g['status']}"
+        docs[_id] = {
+            "_id": _id, "period": period, "year": g["year"],
+            "month": g["month"], "status": g["status"], "count": row["count"],
+            "amount": row["amount"], "by_type": {}
+        }
+    for row in by_type:
+        g = row["_id"]
+        doc = docs.get(f"{g['year']:04d}-{g['month']:02d}|{g['status']}")
+        if doc is not None:
+            doc["by_type"][_type_key({"type": g["type"]})] = {"count": row["count"], "amount": row["amount"]}
+    return docs
+
+
+def rebuild_rollups():
+    """
+    Recompute fine_rollups from the fines collection, replacing each
+    rollup in place so reports stay available. A rollup that received a
+    live $inc meanwhile is recomputed from its month alone. Returns the
+    number of rollup documents written.
+    """
+    started = datetime.utcnow()
+    docs = _rollup_docs({})
+    skipped = replace_untouched(mongo.db.fine_rollups, list(docs.values()), started)
+    written = len(docs) - len(skipped)
+
+    while skipped:
+        since = datetime.utcnow()
+        fresh = {}
+        for period in {_id.split("|")[0] for _id in skipped}:
+            start, end = _month_range(period)
+            fresh.update(_rollup_docs({"issued_at": {"$gte": start, "$lt": end}}))
+        # A rollup missing from `fresh` has no fines left; its live copy stands
+        retry = [fresh[_id] for _id in skipped if _id in fresh]
+        skipped = replace_untouched(mongo.db.fine_rollups, retry, since)
+        written += len(retry) - len(skipped)
+
+    delete_unrebuilt(mongo.db.fine_rollups, started)
+    save_checkpoint(ROLLUPS_JOB, built_at=datetime.utcnow())
+    return written
+
+
+def monthly_rollups(start=None, end=None, by_type=False):
+    """
+    Monthly report rows read from fine_rollups only. start/end are
+    inclusive "YYYY-MM" periods. Raises RollupsNotBuilt until
+    rebuild_rollups() has run once.
+    """
+    if not load_checkpoint(ROLLUPS_JOB):
+        raise RollupsNotBuilt()
+
+    query = {}
+    if start or end:
+        query["period"] = {}
+        if start:
+            query["period"]["$gte"] = start
+        if end:
+            query["period"]["$lte"] = end
+
+    months = {}
+    for doc in read_db().fine_rollups.find(query).sort("period", 1):
+        row = months.setdefault(doc["period"], {
+            "_id": {"year": doc["year"], "month": doc["month"]},
+            "period": doc["period"],
+            "total_fines": 0, "total_amount": 0,
+            "unpaid_fines": 0, "unpaid_amount": 0,
+            "paid_fines": 0, "paid_amount": 0
+        })
+        status = (doc.get("status") or "").lower()
+        row["total_fines"] += doc["count"]
+        row["total_amount"] += doc["amount"]
+        if status in ("unpaid", "paid"):
+            row[f"{status}_fines"] += doc["count"]
+            row[f"{status}_amount"] += doc["amount"]
+        if by_type:
+            types = row.setdefault("by_type", {})
+            for type_key, values in doc.get("by_type", {}).items():
+                merged = types.setdefault(type_key, {"count": 0, "amount": 0})
+                merged["count"] += values["count"]
+                merged["amount"] += values["amount"]
+    return list(months.values())
@@ -1,2 +1,9 @@
-def send_sms(to, message):
-    print(f"Sending SMS to {to}: {message}")
+from app.services.sms_dispatcher import sms_dispatcher
+
+
+def send_sms_via_twilio(mobile_number, message):
+    """
+    Queue an SMS for background delivery and return immediately.
+    Returns False only if the message could not be queued.
+    """
+    return sms_dispatcher.enqueue(mobile_number, message)
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.extensions import mongo
+
+
+_MISSING = object()
+
+
+class VehicleCache:
+    """
+    Bounded LRU + TTL cache of vehicle documents keyed by RFID tag.
+
+    Unknown tags are cached as misses too, so a reader repeatedly presenting
+    an unregistered card does not hit Mongo on every read. Entries are
+    invalidated explicitly when a vehicle is added, updated or deleted; the
+    TTL bounds staleness for changes made by other processes.
+    """
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.get("VEHICLE_CACHE_MAX_SIZE", self.max_size)
+        self.ttl = app.config.get("VEHICLE_CACHE_TTL", self.ttl)
+        self.clear()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, rfid_tag):
+        """
+        Return the cached vehicle (or None for a cached miss), else _MISSING.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(rfid_tag)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+
+            expires_at, vehicle = entry
+            if expires_at <= now:
+                del self._entries[rfid_tag]
+                self.misses += 1
+                return _MISSING
+
+            self._entries.move_to_end(rfid_tag)
+            self.hits += 1
+            return vehicle
+
+    def put(self, rfid_tag, vehicle):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[rfid_tag] = (time.monotonic() + self.ttl, vehicle)
+            self._entries.move_to_end(rfid_tag)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *rfid_tags):
+        with self._lock:
+            for rfid_tag in rfid_tags:
+                if rfid_tag is not None and self._entries.pop(rfid_tag, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+vehicle_cache = VehicleCache()
+
+
+def get_vehicle_by_rfid(rfid_tag):
+    """
+    Look up a vehicle by RFID tag, serving repeat reads from the cache.
+    Returns a shallow copy so callers can't mutate the cached document.
+    """
+    if not vehicle_cache.enabled:
+        return mongo.db.vehicles.find_one({"rfid_tag": rfid_tag})
+
+    vehicle = vehicle_cache.get(rfid_tag)
+    if vehicle is _MISSING:
+        vehicle = mongo.db.vehicles.find_one({"rfid_tag": rfid_tag})
+        vehicle_cache.put(rfid_tag, vehicle)
+
+    return dict(vehicle) if vehicle is not None else None
+
+
+def get_vehicles_by_rfid(rfid_tags):
+    """
+    Resolve many RFID tags at once: cache hits first, then a single $in
+    query for the rest. Returns {rfid_tag: vehicle} for known tags only.
+    """
+    vehicles = {}
+    missing = []
+    for rfid_tag in rfid_tags:
+        cached = vehicle_cache.get(rfid_tag) if vehicle_cache.enabled else _MISSING
+        if cached is _MISSING:
+            missing.append(rfid_tag)
+        elif cached is not None:
+            vehicles[rfid_tag] = dict(cached)
+
+    if missing:
+        for vehicle in mongo.db.vehicles.find({"rfid_tag": {"$in": missing}}):
+            vehicles[vehicle["rfid_tag"]] = vehicle
+            vehicle_cache.put(vehicle["rfid_tag"], dict(vehicle))
+        for rfid_tag in missing:
+            if rfid_tag not in vehicles:
+                vehicle_cache.put(rfid_tag, None)
+
+    return vehicles
@@ -0,0 +1,139 @@
+import time
+from datetime import datetime
+from itertools import islice
+
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from app.extensions import mongo
+
+
+# =====================================================
+# CHECKPOINTS
+# =====================================================
+# Long-running jobs (migrations, sweeps, backfills) record their position
+# in the "job_checkpoints" collection so an interrupted run can resume.
+
+def load_checkpoint(name):
+    return mongo.db.job_checkpoints.find_one({"_id": name}) or {}
+
+
+def save_checkpoint(name, **fields):
+    fields["updated_at"] = datetime.utcnow()
+    mongo.db.job_checkpoints.update_one({"_id": name}, {"$set": fields}, upsert=True)
+
+
+def clear_checkpoint(name):
+    mongo.db.job_checkpoints.delete_one({"_id": name})
+
+
+# =====================================================
+# BATCH ITERATION
+# =====================================================
+
+def iter_id_batches(collection, query, batch_size=1000, start_after=None, projection=None):
+    """
+    Stream a collection in _id order, one list of documents per batch.
+    Each batch is a fresh range query on _id, so nothing is held open
+    between batches and a run can resume from the last _id it saw.
+    """
+    last_id = start_after
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+
+        batch = list(
+            collection.find(batch_query, projection).sort("_id", 1).limit(batch_size)
+        )
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]["_id"]
+
+
+def iter_cursor_batches(cursor, batch_size=500):
+    """
+    Pull an open cursor batch_size documents at a time, one list per batch,
+    matching the cursor's own batch size so each list is one round trip.
+    """
+    cursor = iter(cursor.batch_size(batch_size))
+    while True:
+        docs = list(islice(cursor, batch_size))
+        if not docs:
+            return
+        yield docs
+
+
+# =====================================================
+# REBUILDS
+# =====================================================
+# Derived collections (rollups, ledgers) are kept current with $inc as
+# fines change and rebuilt from the fines collection on demand. Live
+# updates stamp updated_at, so a rebuild can write each document only if
+# nothing touched it since the rebuild read its data.
+
+def _untouched_since(since):
+    return {"$or": [{"updated_at": {"$lt": since}}, {"updated_at": {"$exists": False}}]}
+
+
+def replace_untouched(collection, docs, since):
+    """
+    Replace (or insert) each document, stamped updated_at=since, unless a
+    live update touched it at or after `since`. Returns the _ids that were
+    skipped, to be recomputed from fresh data.
+    """
+    if not docs:
+        return []
+    ops = [
+        ReplaceOne({"_id": doc["_id"], **_untouched_since(since)}, {**doc, "updated_at": since}, upsert=True)
+        for doc in docs
+    ]
+    try:
+        collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # A touched document fails the filter; its upsert then hits the _id
+        if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+            raise
+        return [docs[err["index"]]["_id"] for err in e.details["writeErrors"]]
+    return []
+
+
+def delete_unrebuilt(collection, since):
+    """
+    After a rebuild that started at `since`, drop the documents it neither
+    wrote nor saw a live update for: nothing backs them any more.
+    """
+    return collection.delete_many(_untouched_since(since)).deleted_count
+
+
+class Progress:
+    """
+    Counts processed items and reports throughput.
+    """
+
+    def __init__(self, report=None, every=5.0):
+        self.report = report
+        self.every = every
+        self.processed = 0
+        self.started = time.monotonic()
+        self._last_report = self.started
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def add(self, count, **extra):
+        self.processed += count
+        now = time.monotonic()
+        if self.report and now - self._last_report >= self.every:
+            self._last_report = now
+            self.report(self.summary(**extra))
+
+    def summary(self, **extra):
+        return dict(processed=self.processed, seconds=round(self.elapsed, 2),
+                    per_second=round(self.rate, 1), **extra)
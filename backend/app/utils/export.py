@@ -0,0 +1,41 @@
+import csv
+import io
+import zlib
+
+from app.utils.batch import iter_cursor_batches
+
+
+# =====================================================
+# STREAMING EXPORTS
+# =====================================================
+# Each generator pulls batch_size documents from the cursor, renders them
+# and yields one chunk, so memory stays bounded by the batch size however
+# many documents the query matches. NDJSON uses pagination.ndjson_stream.
+
+def csv_stream(cursor, columns, transform=None, batch_size=500):
+    """
+    Yield a header line and then one CSV chunk per batch. `transform`
+    turns a list of documents into a list of row dicts keyed by column.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for docs in iter_cursor_batches(cursor, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(transform(docs) if transform else docs)
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Compress a stream of text chunks into a single gzip member.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
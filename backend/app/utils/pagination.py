@@ -0,0 +1,105 @@
+import base64
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app
+
+from app.utils.batch import iter_cursor_batches
+
+
+def wants_pagination(args):
+    return any(key in args for key in ("limit", "after", "format", "fields"))
+
+
+def parse_fields(args):
+    """
+    ?fields=vehicle_no,status -> {"vehicle_no": 1, "status": 1}, else None.
+    """
+    fields = [f.strip() for f in args.get("fields", "").split(",") if f.strip()]
+    return {f: 1 for f in fields} or None
+
+
+def parse_limit(args):
+    max_size = current_app.config["MAX_PAGE_SIZE"]
+    try:
+        limit = int(args.get("limit", current_app.config["DEFAULT_PAGE_SIZE"]))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, max_size))
+
+
+def encode_cursor(doc, sort_field):
+    value = doc.get(sort_field) if sort_field != "_id" else None
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = f"{value if value is not None else ''}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def cursor_filter(cursor, sort_field):
+    """
+    Translate an opaque cursor into the query for the next page of a
+    descending (sort_field, _id) keyset.
+    """
+    try:
+        value, oid = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        oid = ObjectId(oid)
+        value = datetime.fromisoformat(value) if value else None
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+    if sort_field == "_id":
+        return {"_id": {"$lt": oid}}
+    if value is None:
+        # Documents without the sort field sort last; page through them by _id
+        return {sort_field: None, "_id": {"$lt": oid}}
+    return {"$or": [
+        {sort_field: {"$lt": value}},
+        {sort_field: value, "_id": {"$lt": oid}},
+        {sort_field: None}
+    ]}
+
+
+def keyset_find(collection, filters, args, sort_field="_id"):
+    """
+    Newest-first keyset pagination. Returns (cursor, limit);
+    fetch limit + 1 documents to know whether another page exists.
+    """
+    limit = parse_limit(args)
+    query = dict(filters)
+    if args.get("after"):
+        query = {"$and": [query, cursor_filter(args["after"], sort_field)]}
+
+    projection = parse_fields(args)
+    if projection is not None and sort_field != "_id":
+        projection[sort_field] = 1
+
+    sort = [(sort_field, -1), ("_id", -1)] if sort_field != "_id" else [("_id", -1)]
+    cursor = collection.find(query, projection).sort(sort)
+    return cursor, limit
+
+
+def page(cursor, limit, sort_field="_id"):
+    """
+    Materialize one page. Returns (docs, next_cursor or None).
+    """
+    docs = list(cursor.limit(limit + 1))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
+
+
+def ndjson_stream(cursor, transform=None, batch_size=500):
+    """
+    Yield one JSON line per document straight from the cursor.
+    `transform` receives each batch as a list, so per-batch lookups stay
+    at one query per batch_size documents.
+    """
+    dumps = current_app.json.dumps
+    for docs in iter_cursor_batches(cursor, batch_size):
+        if transform:
+            docs = transform(docs)
+        yield "".join(dumps(doc) + "\n" for doc in docs)
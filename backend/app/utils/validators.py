@@ -1,2 +1,91 @@
+from datetime import datetime
+
+from app.models import Vehicle, Fine, naive_utc
+
+
 def validate_request(data, fields):
     return all(field in data for field in fields)
+
+
+def parse_date(value):
+    """
+    Parse an expiry date sent by a client ("2025-03-31" or a full ISO
+    timestamp) into a naive UTC datetime. Empty values become None.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return naive_utc(value)
+    if not isinstance(value, str):
+        raise ValueError("must be an ISO date string")
+    return naive_utc(datetime.fromisoformat(value.strip()))
+
+
+def validate_vehicle(data, partial=False):
+    """
+    Validate a vehicle payload against the Vehicle model fields.
+    Returns (clean_document, errors). With partial=True (updates) only
+    the fields present are checked. Fields other than the dates must be
+    strings.
+    """
+    if not isinstance(data, dict):
+        return None, {"_": "Expected a JSON object"}
+
+    errors = {}
+    clean = {}
+
+    for field in data:
+        if field not in Vehicle.FIELDS:
+            errors[field] = "Unknown field"
+
+    required = () if partial else Vehicle.REQUIRED_FIELDS
+    for field in Vehicle.FIELDS:
+        if field not in data:
+            if field in required:
+                errors[field] = "Required"
+            continue
+
+        value = data[field]
+        if field in Vehicle.DATE_FIELDS:
+            try:
+                clean[field] = parse_date(value)
+            except ValueError:
+                errors[field] = "Invalid date, expected YYYY-MM-DD"
+        elif value is None or isinstance(value, str):
+            # Blank optional fields (model_no, mobile_number) are stored as None
+            value = value.strip() if value else None
+            if field in Vehicle.REQUIRED_FIELDS and not value:
+                errors[field] = "Required"
+            clean[field] = value
+        else:
+            errors[field] = "Must be a string"
+
+    return clean, errors
+
+
+def validate_fine(data):
+    """
+    Validate a manually issued fine ({vehicle_no, rfid_tag, issues, amount})
+    and convert it to the canonical Fine fields. Returns (clean, errors).
+    """
+    if not isinstance(data, dict):
+        return None, {"_": "Expected a JSON object"}
+
+    errors = {}
+    vehicle_no = data.get("vehicle_no")
+    rfid_tag = data.get("rfid_tag")
+    if not (isinstance(vehicle_no, str) and vehicle_no.strip()) and not (isinstance(rfid_tag, str) and rfid_tag.strip()):
+        errors["vehicle_no"] = "vehicle_no or rfid_tag is required"
+
+    amount = data.get("amount")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount < 0:
+        errors["amount"] = "Must be a non-negative number"
+
+    if errors:
+        return None, errors
+    return {
+        "vehicle_no": vehicle_no.strip() if isinstance(vehicle_no, str) else None,
+        "rfid_tag": rfid_tag.strip() if isinstance(rfid_tag, str) else None,
+        "violations": Fine.violations_from_issues(data.get("issues"), amount),
+        "total_amount": amount
+    }, {}
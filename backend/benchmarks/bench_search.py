@@ -0,0 +1,137 @@
+"""
+Benchmark: vehicle type-ahead (search_service.search_vehicles) latency.
+
+Seeds --vehicles synthetic vehicles (plates like "MH12AB1234") into the
+database in BENCH_MONGO_URI, creates the manifest indexes, then times
+prefix queries of 2-8 characters typed with random spacing, plus fuzzy
+queries with one character changed. Prints p50/p95/p99 per query kind and
+how often the target plate was found; fails when the prefix p95 exceeds
+--budget-ms or fuzzy queries find the target less often than
+--min-fuzzy-recall.
+
+A disposable mongod is required: mongomock has no indexes, so its
+numbers say nothing about the index scans being measured here.
+
+Usage (from backend/):
+    BENCH_MONGO_URI=mongodb://localhost:27017/rfid_bench python benchmarks/bench_search.py --vehicles 1000000
+    python benchmarks/bench_search.py --skip-seed --queries 2000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+STATES = ("MH", "KA", "DL", "TN", "GJ", "UP", "RJ", "KL", "AP", "WB")
+
+
+def plate(rng):
+    return (f"{rng.choice(STATES)}{rng.randint(1, 50):02d}"
+            f"{rng.choice(string.ascii_uppercase)}{rng.choice(string.ascii_uppercase)}{rng.randint(1, 9999):04d}")
+
+
+def seed(db, count, rng):
+    from app.models import Vehicle
+
+    db.vehicles.delete_many({"owner_name": "Search Bench"})
+    batch = []
+    for i in range(count):
+        vehicle = {"vehicle_no": plate(rng), "rfid_tag": f"SB{i:08X}", "owner_name": "Search Bench"}
+        vehicle.update(Vehicle.search_fields(vehicle))
+        batch.append(vehicle)
+        if len(batch) == 10000:
+            db.vehicles.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.vehicles.insert_many(batch, ordered=False)
+
+
+def spaced(text, rng):
+    # How officers type: "MH12 AB 12", "mh-12ab", ...
+    out = []
+    for i, ch in enumerate(text):
+        if i and rng.random() < 0.2:
+            out.append(rng.choice(" -"))
+        out.append(ch.lower() if rng.random() < 0.3 else ch)
+    return "".join(out)
+
+
+def typo(text, rng):
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice(string.ascii_uppercase + string.digits) + text[i + 1:]
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vehicles", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=10)
+    parser.add_argument("--min-fuzzy-recall", type=float, default=0.9)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the vehicles of a previous run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    uri = os.environ.get("BENCH_MONGO_URI", "mongodb://localhost:27017/rfid_bench")
+    os.environ["MONGO_URI"] = uri
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ["AUTO_CREATE_INDEXES"] = "false"
+
+    from app import create_app
+    from app.extensions import mongo
+    from app.indexes import ensure_indexes
+    from app.services.search_service import search_vehicles
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        db = mongo.db
+        if not args.skip_seed:
+            started = time.perf_counter()
+            seed(db, args.vehicles, rng)
+            print(f"seeded {args.vehicles} vehicles in {time.perf_counter() - started:.1f}s")
+        ensure_indexes(db)
+
+        plates = [v["vehicle_no"] for v in db.vehicles.aggregate([
+            {"$match": {"owner_name": "Search Bench"}}, {"$sample": {"size": 1000}}
+        ])]
+        timings = {"prefix": [], "fuzzy": []}
+        hits = {"prefix": 0, "fuzzy": 0}
+        for _ in range(args.queries):
+            target = rng.choice(plates)
+            queries = (("prefix", spaced(target[:rng.randint(2, 8)], rng), False),
+                       ("fuzzy", typo(target, rng), True))
+            for kind, query, fuzzy in queries:
+                started = time.perf_counter()
+                results = search_vehicles(query, args.limit, fuzzy=fuzzy)
+                timings[kind].append(time.perf_counter() - started)
+                hits[kind] += any(r["vehicle_no"] == target for r in results)
+
+    print(f"{'query':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  found target")
+    for kind, values in timings.items():
+        values.sort()
+        print(f"{kind:<8} {percentile(values, 0.5) * 1000:>8.2f} {percentile(values, 0.95) * 1000:>8.2f} "
+              f"{percentile(values, 0.99) * 1000:>8.2f}  {hits[kind] / len(values):.0%}")
+
+    prefix_p95 = percentile(timings["prefix"], 0.95) * 1000
+    if prefix_p95 > args.budget_ms:
+        print(f"FAIL: prefix p95 {prefix_p95:.2f} ms over budget {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    fuzzy_recall = hits["fuzzy"] / len(timings["fuzzy"])
+    if fuzzy_recall < args.min_fuzzy_recall:
+        print(f"FAIL: fuzzy search found {fuzzy_recall:.0%} of targets, below {args.min_fuzzy_recall:.0%}")
+        sys.exit(1)
+    print("OK: prefix search within budget, fuzzy search finds its targets")
+
+
+if __name__ == "__main__":
+    main()
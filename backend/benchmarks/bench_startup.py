@@ -0,0 +1,96 @@
+"""
+Benchmark: cold start of the serverless entry point (api/index.py).
+
+Each trial runs in a fresh interpreter and measures
+  import   importing api.index, i.e. create_app()
+  first    the first request to "/", which needs no database
+and checks that neither step created the Mongo client or imported twilio.
+
+MONGO_URI defaults to an unresolvable mongodb+srv:// address: if startup
+starts touching the database again, the trial fails instead of hanging.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--trials 5] [--import-budget-ms 1500] [--first-request-budget-ms 250]
+Exits 1 when a median exceeds its budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+TRIAL = """
+import json, sys, time
+started = time.perf_counter()
+from api.index import app
+imported = time.perf_counter()
+response = app.test_client().get("/")
+finished = time.perf_counter()
+
+from app.extensions import mongo
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (finished - imported) * 1000,
+    "status": response.status_code,
+    "mongo_connected": mongo.connected,
+    "twilio_imported": "twilio" in sys.modules,
+}))
+"""
+
+
+def run_trial():
+    env = dict(os.environ)
+    env["MONGO_URI"] = os.environ.get("BENCH_MONGO_URI", "mongodb+srv://bench.invalid/rfid_bench")
+    env.setdefault("SECRET_KEY", "bench")
+    env.pop("AUTO_CREATE_INDEXES", None)  # exercise the entry point's own default
+    result = subprocess.run(
+        [sys.executable, "-c", TRIAL], cwd=BACKEND, env=env,
+        capture_output=True, text=True, timeout=60
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        raise SystemExit("FAIL: trial crashed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1500)
+    parser.add_argument("--first-request-budget-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    trials = [run_trial() for _ in range(args.trials)]
+    print(f"{'trial':>5} {'import ms':>10} {'first req ms':>13} {'status':>7}")
+    for i, trial in enumerate(trials, 1):
+        print(f"{i:>5} {trial['import_ms']:>10.1f} {trial['first_request_ms']:>13.1f} {trial['status']:>7}")
+
+    import_ms = statistics.median(t["import_ms"] for t in trials)
+    first_ms = statistics.median(t["first_request_ms"] for t in trials)
+    print(f"median import {import_ms:.1f} ms (budget {args.import_budget_ms:.0f}), "
+          f"first request {first_ms:.1f} ms (budget {args.first_request_budget_ms:.0f})")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append("import time over budget")
+    if first_ms > args.first_request_budget_ms:
+        failures.append("first request over budget")
+    if any(t["status"] != 200 for t in trials):
+        failures.append("first request did not return 200")
+    if any(t["mongo_connected"] for t in trials):
+        failures.append("Mongo client created before it was needed")
+    if any(t["twilio_imported"] for t in trials):
+        failures.append("twilio imported at startup")
+
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK: startup within budget")
+
+
+if __name__ == "__main__":
+    main()
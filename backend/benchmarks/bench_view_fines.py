@@ -0,0 +1,101 @@
+"""
+Benchmark: database round-trips per GET /api/admin/fines.
+
+Seeds canonical fines (they carry vehicle_no and owner_name, see
+`flask migrate fines`) into a scratch database and counts the commands each
+request sends, per collection. Listing fines must not look vehicles up at
+all, however many fines there are.
+
+Usage (from backend/, against a disposable database):
+    BENCH_MONGO_URI=mongodb://localhost:27017/rfid_bench python benchmarks/bench_view_fines.py
+"""
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import jwt
+from pymongo import MongoClient, monitoring
+
+from app import create_app
+from app.extensions import mongo
+
+
+SIZES = [10, 100, 1000, 5000]
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self.commands[(event.command_name, collection)] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(db, size):
+    db.fines.delete_many({})
+    db.vehicles.delete_many({})
+    db.vehicles.insert_many([
+        {"vehicle_no": f"MH12AB{i:04d}", "rfid_tag": f"TAG{i:05d}", "owner_name": "Bench", "model_no": "M"}
+        for i in range(size)
+    ])
+    db.fines.insert_many([
+        {"vehicle_no": f"MH12AB{i:04d}", "rfid_tag": f"TAG{i:05d}", "owner_name": "Bench", "status": "UNPAID",
+         "violations": [{"type": "Insurance Expired", "fine": 500}], "total_amount": 500,
+         "issued_at": datetime.utcnow()}
+        for i in range(size)
+    ])
+
+
+def main():
+    uri = os.environ.get("BENCH_MONGO_URI", "mongodb://localhost:27017/rfid_bench")
+    os.environ["MONGO_URI"] = uri
+    os.environ.setdefault("SECRET_KEY", "bench")
+
+    app = create_app()
+    counter = CommandCounter()
+    client = MongoClient(uri, event_listeners=[counter])
+    mongo.cx = client
+    mongo.db = client.get_default_database()
+
+    token = jwt.encode({"id": "bench", "role": "ADMIN"}, app.config["SECRET_KEY"], algorithm="HS256")
+    http = app.test_client()
+
+    print(f"{'fines':>6} {'vehicle queries':>16} {'fine commands':>14} {'ms':>8}")
+    results = []
+    for size in SIZES:
+        seed(mongo.db, size)
+        counter.commands.clear()
+        started = time.perf_counter()
+        response = http.get("/api/admin/fines", headers={"Authorization": token})
+        elapsed = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.status_code
+
+        vehicle_queries = sum(n for (_, coll), n in counter.commands.items() if coll == "vehicles")
+        fine_commands = sum(n for (_, coll), n in counter.commands.items() if coll == "fines")
+        results.append(vehicle_queries)
+        print(f"{size:>6} {vehicle_queries:>16} {fine_commands:>14} {elapsed:>8.1f}")
+
+    client.drop_database(mongo.db.name)
+
+    # fine commands grow only with cursor getMore batches
+    if any(results):
+        print("FAIL: listing fines looks vehicles up")
+        sys.exit(1)
+    print("OK: fines are listed without vehicle lookups")
+
+
+if __name__ == "__main__":
+    main()
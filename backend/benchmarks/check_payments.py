@@ -0,0 +1,170 @@
+"""
+Check: idempotent pay-fines (payment_service) against a real database.
+
+Runs the payment scenarios through POST /api/admin/pay-fines and checks
+the receipts, fines, counters and ledger after each one:
+
+  replay     the same key twice pays once; the second reply is replayed
+  nothing    a new key with no unpaid fines is a 404 and leaves no receipt
+  in-flight  a fresh PENDING claim on the key answers 409
+  resume     a stale PENDING claim is finished by the retry
+  failure    a ledger failure is a 500; after the claim goes stale the retry
+             applies the ledger once, without paying or counting again
+  race       concurrent requests with one key settle the fines exactly once
+  input      non-string token or key is a 400
+
+A disposable mongod is required: the ledger update uses array_filters,
+which mongomock doesn't implement (tests/test_payments.py runs the idempotency
+cases on mongomock). Exits 1 on the first failed check.
+
+Usage (from backend/):
+    BENCH_MONGO_URI=mongodb://localhost:27017/rfid_payments_check python benchmarks/check_payments.py
+"""
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+TOKEN = "check-token"
+VEHICLE_NO = "CHK0001"
+
+
+def check(name, condition, detail=""):
+    if not condition:
+        print(f"FAIL {name} {detail}")
+        sys.exit(1)
+    print(f"ok   {name}")
+
+
+def main():
+    uri = os.environ.get("BENCH_MONGO_URI", "mongodb://localhost:27017/rfid_payments_check")
+    os.environ["MONGO_URI"] = uri
+    os.environ.setdefault("SECRET_KEY", "check")
+    os.environ["SMS_TRANSPORT"] = "stub"
+    os.environ["SMS_ASYNC"] = "false"
+
+    from app import create_app
+    from app.extensions import mongo
+    from app.indexes import ensure_indexes
+    from app.services import payment_service
+    from app.services.fine_service import issue_fines
+    from app.services.ledger_service import rebuild_ledgers
+    from app.services.stats_service import recompute_stats
+
+    app = create_app()
+    http = app.test_client()
+
+    def pay(key=None, **body):
+        headers = {"Idempotency-Key": key} if key else {}
+        response = http.post("/api/admin/pay-fines", json={"token": TOKEN, **body}, headers=headers)
+        return response.status_code, response.get_json()
+
+    with app.app_context():
+        db = mongo.db
+        db.client.drop_database(db.name)
+        ensure_indexes(db)
+        app.config["FINE_DEDUP_WINDOW_SECONDS"] = 0
+
+        def add_fines(*amounts):
+            issue_fines([{
+                "vehicle_no": VEHICLE_NO, "rfid_tag": "CHK", "owner_name": "Check", "mobile_number": None,
+                "status": "UNPAID", "issued_at": datetime.utcnow(), "token": TOKEN,
+                "violations": [{"type": "Check", "fine": amount}], "total_amount": amount
+            } for amount in amounts])
+
+        def state():
+            counters = db.counters.find_one({"_id": "fines"})
+            ledger = db.fine_ledgers.find_one({"_id": VEHICLE_NO})
+            return counters["unpaid_amount"], counters["total_revenue"], ledger["unpaid_amount"]
+
+        recompute_stats()
+        rebuild_ledgers()
+
+        # replay
+        add_fines(1000, 500)
+        status, first = pay("k-replay")
+        check("replay: first call pays", status == 200 and not first["replayed"] and first["total_paid"] == 1500,
+              first)
+        status, second = pay("k-replay")
+        check("replay: second call is replayed", status == 200 and second["replayed"]
+              and second["receipt_id"] == first["receipt_id"], second)
+        check("replay: counted once", state() == (0, 1500, 0), state())
+
+        # nothing
+        status, _ = pay("k-nothing")
+        check("nothing: 404", status == 404)
+        check("nothing: no receipt left", not db.payments.find_one({"idempotency_key": "k-nothing"}))
+
+        # in-flight
+        add_fines(200)
+        db.payments.insert_one({"token": TOKEN, "idempotency_key": "k-flight", "status": "PENDING",
+                                "payment_method": "upi", "created_at": datetime.utcnow()})
+        status, _ = pay("k-flight")
+        check("in-flight: 409", status == 409)
+
+        # resume
+        db.payments.update_one({"idempotency_key": "k-flight"},
+                               {"$set": {"created_at": datetime.utcnow() - timedelta(minutes=5)}})
+        status, body = pay("k-flight")
+        check("resume: stale claim finished", status == 200 and body["total_paid"] == 200, body)
+        check("resume: counted once", state() == (0, 1700, 0), state())
+
+        # failure
+        add_fines(300)
+        record_ledger_paid = payment_service.record_ledger_paid
+
+        def ledger_down(*args):
+            raise RuntimeError("ledger down")
+
+        payment_service.record_ledger_paid = ledger_down
+        try:
+            status, _ = pay("k-fail")
+        finally:
+            payment_service.record_ledger_paid = record_ledger_paid
+        receipt = db.payments.find_one({"idempotency_key": "k-fail"})
+        check("failure: 500, counters applied, ledger not", status == 500
+              and receipt["status"] == "PENDING" and receipt.get("applied") == ["counters"], receipt)
+        check("failure: fresh retry is 409", pay("k-fail")[0] == 409)
+        db.payments.update_one({"_id": receipt["_id"]},
+                               {"$set": {"created_at": datetime.utcnow() - timedelta(minutes=5)}})
+        status, body = pay("k-fail")
+        check("failure: stale retry completes", status == 200 and body["total_paid"] == 300, body)
+        check("failure: ledger applied once, counters not twice", state() == (0, 2000, 0), state())
+
+        # race
+        add_fines(50, 70)
+        results = []
+
+        def worker():
+            with app.test_client() as client:
+                response = client.post("/api/admin/pay-fines", json={"token": TOKEN},
+                                       headers={"Idempotency-Key": "k-race"})
+                results.append((response.status_code, response.get_json()))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        paid = [body for status, body in results if status == 200 and not body["replayed"]]
+        check("race: one request pays", len(paid) == 1 and paid[0]["total_paid"] == 120, results)
+        check("race: others are replayed or 409", all(
+            status == 409 or (status == 200 and body["replayed"]) for status, body in results
+            if not (status == 200 and not body["replayed"])
+        ), results)
+        check("race: counted once", state() == (0, 2120, 0), state())
+
+        # input
+        check("input: non-string key", pay(idempotency_key=5)[0] == 400)
+        check("input: non-string token", http.post(
+            "/api/admin/pay-fines", json={"token": {"$ne": None}}).status_code == 400)
+
+        db.client.drop_database(db.name)
+    print("OK: payment checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Load test: N gate readers replaying the ESP8266 request sequence.
+
+Each simulated reader loops over card reads. By default it replays the
+original two-call sequence: POST check-expiry with {"rfid": tag}, then,
+when the response says insurance or PUC expired, POST impose-fine with the
+same body. --gate uses the single /api/scan/gate call the device now makes.
+Tags are drawn from a configurable mix:
+
+  --vehicles N     registered vehicles seeded into the database
+  --expired F      fraction of them with expired insurance/PUC
+  --unknown F      fraction of reads with an unregistered card
+  --repeat F       chance a reader presents the same card again (car idling at the gate)
+  --zipf S         skew registered tags towards a few hot vehicles (0 = uniform)
+
+Targets:
+  (default)        the app in this process, on BENCH_MONGO_URI (a disposable local mongod)
+  --in-memory      the app in this process, on mongomock (pip install mongomock)
+  --url URL        a running server; it must use the database in BENCH_MONGO_URI,
+                   which is seeded before the run
+
+Reports throughput and p50/p95/p99 latency per endpoint. In-process runs
+share one interpreter with the readers, so treat their numbers as relative.
+
+Usage (from backend/):
+    python benchmarks/load_gate.py --readers 20 --duration 30
+    python benchmarks/load_gate.py --in-memory --readers 8 --unknown 0.1 --repeat 0.5
+    BENCH_MONGO_URI=mongodb://localhost:27017/rfid python benchmarks/load_gate.py --url http://127.0.0.1:5000
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+CHECK_PATH = "/api/admin/check-expiry"
+FINE_PATH = "/api/admin/impose-fine"
+GATE_PATH = "/api/scan/gate"
+
+
+# =====================================================
+# TARGETS
+# =====================================================
+
+def in_memory_client():
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder
+
+    # mongomock 4.3 predates the `sort` argument pymongo >= 4.11 passes for UpdateOne
+    add_update = BulkOperationBuilder.add_update
+    BulkOperationBuilder.add_update = lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+    return mongomock.MongoClient()
+
+
+def local_app(args):
+    """
+    Build the app on the bench database. Returns (db, post) where
+    post(path, body) -> (status code, JSON body).
+    """
+    from pymongo import MongoClient
+
+    uri = os.environ.get("BENCH_MONGO_URI", "mongodb://localhost:27017/rfid_bench")
+    os.environ["MONGO_URI"] = uri
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("SMS_TRANSPORT", "stub")
+    os.environ.setdefault("LOG_REQUESTS", "false")
+    os.environ["AUTO_CREATE_INDEXES"] = "false"
+
+    from app import create_app
+    from app.extensions import mongo
+    from app.indexes import ensure_indexes
+
+    app = create_app()
+    client = in_memory_client() if args.in_memory else MongoClient(uri)
+    mongo.cx = client
+    mongo.db = client["rfid_bench"] if args.in_memory else client.get_default_database()
+    ensure_indexes(mongo.db)
+
+    local = threading.local()
+
+    def post(path, body):
+        # One test client per reader thread
+        if not hasattr(local, "http"):
+            local.http = app.test_client()
+        response = local.http.post(path, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+    return mongo.db, post
+
+
+def remote_target(args):
+    import requests
+    from pymongo import MongoClient
+
+    uri = os.environ.get("BENCH_MONGO_URI", "mongodb://localhost:27017/rfid_bench")
+    db = MongoClient(uri).get_default_database()
+    local = threading.local()
+
+    def post(path, body):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        response = local.session.post(args.url.rstrip("/") + path, json=body, timeout=30)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+    return db, post
+
+
+# =====================================================
+# WORKLOAD
+# =====================================================
+
+def seed(db, args):
+    """
+    Replace the bench vehicles and their fines. Returns the seeded tags.
+    """
+    db.vehicles.delete_many({"owner_name": "Load Test"})
+    db.fines.delete_many({"rfid_tag": {"$regex": "^LOAD"}})
+
+    now = datetime.utcnow()
+    expired_count = int(args.vehicles * args.expired)
+    vehicles = []
+    for i in range(args.vehicles):
+        expired = i < expired_count
+        vehicles.append({
+            "vehicle_no": f"LT{i:06d}",
+            "rfid_tag": f"LOAD{i:06d}",
+            "owner_name": "Load Test",
+            "model_no": "Bench",
+            "insurance_expiry": now - timedelta(days=30) if expired else now + timedelta(days=365),
+            "puc_expiry": now + timedelta(days=365),
+        })
+    if vehicles:
+        db.vehicles.insert_many(vehicles)
+    return [v["rfid_tag"] for v in vehicles]
+
+
+class TagPicker:
+    def __init__(self, tags, args, rng):
+        self.tags = tags
+        self.args = args
+        self.rng = rng
+        self.last = None
+        # Zipf weights over registered tags; s = 0 is uniform
+        weights = [1 / (rank ** args.zipf) for rank in range(1, len(tags) + 1)]
+        self.cum_weights = list(accumulate(weights))
+
+    def next(self):
+        if self.last is not None and self.rng.random() < self.args.repeat:
+            return self.last
+        if not self.tags or self.rng.random() < self.args.unknown:
+            tag = f"UNKNOWN{self.rng.randrange(10 ** 6):06d}"
+        else:
+            tag = self.rng.choices(self.tags, cum_weights=self.cum_weights)[0]
+        self.last = tag
+        return tag
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+    def error(self, name):
+        with self._lock:
+            self.errors[name] += 1
+
+
+def reader(post, picker, recorder, deadline, think, gate):
+    while time.monotonic() < deadline:
+        tag = picker.next()
+        try:
+            started = time.perf_counter()
+            if gate:
+                status, _ = post(GATE_PATH, {"rfid": tag})
+                recorder.record("gate", time.perf_counter() - started, status)
+                continue
+
+            status, body = post(CHECK_PATH, {"rfid": tag})
+            recorder.record("check-expiry", time.perf_counter() - started, status)
+
+            if status == 200 and body and (body.get("insurance_expired") or body.get("puc_expired")):
+                started = time.perf_counter()
+                status, _ = post(FINE_PATH, {"rfid": tag})
+                recorder.record("impose-fine", time.perf_counter() - started, status)
+        except Exception as e:
+            recorder.error(type(e).__name__)
+        finally:
+            if think:
+                time.sleep(think)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def report(recorder, elapsed):
+    print(f"{'endpoint':<14} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    total = 0
+    for endpoint in ("check-expiry", "impose-fine", "gate"):
+        if endpoint not in recorder.latencies:
+            continue
+        values = sorted(recorder.latencies.get(endpoint, []))
+        total += len(values)
+        statuses = " ".join(f"{code}:{n}" for code, n in sorted(recorder.statuses[endpoint].items()))
+        print(
+            f"{endpoint:<14} {len(values):>9} {len(values) / elapsed:>8.1f} "
+            f"{percentile(values, 0.50) * 1000:>8.2f} {percentile(values, 0.95) * 1000:>8.2f} "
+            f"{percentile(values, 0.99) * 1000:>8.2f} {(values[-1] if values else 0) * 1000:>8.2f}  {statuses}"
+        )
+    print(f"total {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+    if recorder.errors:
+        print("errors: " + ", ".join(f"{name}:{n}" for name, n in recorder.errors.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=15, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between cards (the device waits 3000)")
+    parser.add_argument("--vehicles", type=int, default=1000)
+    parser.add_argument("--expired", type=float, default=0.2)
+    parser.add_argument("--unknown", type=float, default=0.05)
+    parser.add_argument("--repeat", type=float, default=0.3)
+    parser.add_argument("--zipf", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--gate", action="store_true", help="one /api/scan/gate call per read")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--in-memory", action="store_true")
+    target.add_argument("--url")
+    args = parser.parse_args()
+
+    db, post = remote_target(args) if args.url else local_app(args)
+    tags = seed(db, args)
+    # Same hot set for every reader, not just the expired vehicles
+    random.Random(args.seed).shuffle(tags)
+
+    recorder = Recorder()
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(
+            target=reader,
+            args=(post, TagPicker(tags, args, random.Random(args.seed + i)), recorder, deadline,
+                  args.think_ms / 1000, args.gate),
+            daemon=True
+        )
+        for i in range(args.readers)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    print(f"{args.readers} readers, {args.vehicles} vehicles ({args.expired:.0%} expired), "
+          f"unknown {args.unknown:.0%}, repeat {args.repeat:.0%}, zipf {args.zipf}")
+    report(recorder, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["MONGO_URI"] = "mongodb://localhost:27017/rfid_test"
+os.environ["AUTO_CREATE_INDEXES"] = "false"
+os.environ["SMS_TRANSPORT"] = "stub"
+os.environ["SMS_ASYNC"] = "false"
+
+
+@pytest.fixture
+def app():
+    from app import create_app
+    from app.extensions import mongo
+
+    app = create_app()
+    client = mongomock.MongoClient()
+    mongo.cx = client
+    mongo.db = client.get_database("rfid_test")
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db(app):
+    from app.extensions import mongo
+    return mongo.db
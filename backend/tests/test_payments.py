@@ -0,0 +1,153 @@
+"""
+Idempotent pay-fines (payment_service) against mongomock.
+
+The counters and ledger steps are replaced by recorders: what matters here
+is how often each one runs, and mongomock's bulk_write can't run them
+anyway. benchmarks/check_payments.py covers the real writes on a mongod.
+"""
+from datetime import datetime, timedelta
+
+import mongomock.collection
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from app.services import payment_service
+from app.services.payment_service import NothingToPay, PaymentInProgress, pay_fines
+
+TOKEN = "test-token"
+
+
+@pytest.fixture
+def steps(db, monkeypatch):
+    db.payments.create_index([("token", 1), ("idempotency_key", 1)], unique=True)
+    calls = {"counters": [], "ledger": []}
+    monkeypatch.setattr(payment_service, "record_fines_paid",
+                        lambda fines: calls["counters"].append(sorted(f["_id"] for f in fines)))
+    monkeypatch.setattr(payment_service, "record_ledger_paid",
+                        lambda fines, paid_at: calls["ledger"].append(sorted(f["_id"] for f in fines)))
+    return calls
+
+
+def add_fines(db, *amounts):
+    return db.fines.insert_many([{
+        "vehicle_no": "TEST0001", "token": TOKEN, "status": "UNPAID", "mobile_number": None,
+        "issued_at": datetime.utcnow(), "violations": [{"type": "Test", "fine": amount}],
+        "total_amount": amount
+    } for amount in amounts]).inserted_ids
+
+
+def make_stale(db, key):
+    db.payments.update_one({"idempotency_key": key},
+                           {"$set": {"created_at": datetime.utcnow() - timedelta(minutes=5)}})
+
+
+def test_retry_with_same_key_is_replayed(db, steps):
+    fine_ids = add_fines(db, 1000, 500)
+
+    first, _ = pay_fines(TOKEN, "k1")
+    second, sms_queued = pay_fines(TOKEN, "k1")
+
+    assert first["total_paid"] == 1500 and not first["replayed"]
+    assert second["replayed"] and second["receipt_id"] == first["receipt_id"]
+    assert not sms_queued
+    assert steps == {"counters": [sorted(fine_ids)], "ledger": [sorted(fine_ids)]}
+    assert db.fines.count_documents({"status": "PAID"}) == 2
+
+
+def test_fresh_claim_is_in_progress(db, steps):
+    add_fines(db, 200)
+    db.payments.insert_one({"token": TOKEN, "idempotency_key": "k1", "status": "PENDING",
+                            "payment_method": "upi", "created_at": datetime.utcnow()})
+
+    with pytest.raises(PaymentInProgress):
+        pay_fines(TOKEN, "k1")
+    assert steps == {"counters": [], "ledger": []}
+
+
+def test_failed_step_is_run_by_the_stale_retry_only(db, steps, monkeypatch):
+    fine_ids = add_fines(db, 300)
+
+    def ledger_down(fines, paid_at):
+        raise RuntimeError("ledger down")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(payment_service, "record_ledger_paid", ledger_down)
+        with pytest.raises(RuntimeError):
+            pay_fines(TOKEN, "k1")
+    assert db.payments.find_one({"idempotency_key": "k1"})["applied"] == ["counters"]
+
+    with pytest.raises(PaymentInProgress):
+        pay_fines(TOKEN, "k1")
+    make_stale(db, "k1")
+    receipt, _ = pay_fines(TOKEN, "k1")
+
+    assert receipt["total_paid"] == 300 and not receipt["replayed"]
+    assert steps == {"counters": [[fine_ids[0]]], "ledger": [[fine_ids[0]]]}
+
+
+def test_concurrent_stale_takeover_has_one_winner(db, steps):
+    add_fines(db, 100)
+    receipt, claimed = payment_service._claim(TOKEN, "k1", "upi")
+    assert claimed
+    make_stale(db, "k1")
+    stale = db.payments.find_one({"_id": receipt["_id"]})
+
+    # Two retries read the same stale receipt; only one may re-claim it
+    assert payment_service._take_over(stale) is not None
+    assert payment_service._take_over(stale) is None
+
+
+def test_slow_original_does_not_apply_twice(db, steps):
+    fine_ids = add_fines(db, 100, 50)
+
+    # The original request settles, then stalls until its claim is stale
+    receipt, _ = payment_service._claim(TOKEN, "k1", "upi")
+    fines = payment_service._settle(receipt)
+    make_stale(db, "k1")
+
+    retried, _ = pay_fines(TOKEN, "k1")
+    assert retried["total_paid"] == 150
+
+    # The original wakes up and carries on with its snapshot
+    payment_service._apply(receipt, fines)
+    replayed, _ = pay_fines(TOKEN, "k1")
+
+    assert replayed["replayed"] and replayed["receipt_id"] == retried["receipt_id"]
+    assert steps == {"counters": [sorted(fine_ids)], "ledger": [sorted(fine_ids)]}
+
+
+def test_nothing_to_pay_leaves_no_receipt(db, steps):
+    with pytest.raises(NothingToPay):
+        pay_fines(TOKEN, "k1")
+    assert db.payments.count_documents({}) == 0
+
+
+def test_receipt_deleted_by_nothing_to_pay_race(db, steps, monkeypatch):
+    fine_ids = add_fines(db, 70)
+    insert_one = mongomock.collection.Collection.insert_one
+    raced = []
+
+    def racing_insert(self, document, *args, **kwargs):
+        # The first insert loses to a receipt that a NothingToPay request
+        # deletes before our lookup
+        if self.name == "payments" and not raced:
+            raced.append(True)
+            raise DuplicateKeyError("E11000 duplicate key")
+        return insert_one(self, document, *args, **kwargs)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "insert_one", racing_insert)
+    receipt, _ = pay_fines(TOKEN, "k1")
+
+    assert receipt["total_paid"] == 70 and not receipt["replayed"]
+    assert steps["counters"] == [[fine_ids[0]]]
+
+
+def test_receipt_that_keeps_vanishing_is_in_progress(db, steps, monkeypatch):
+    add_fines(db, 70)
+
+    def always_duplicate(self, document, *args, **kwargs):
+        raise DuplicateKeyError("E11000 duplicate key")
+
+    monkeypatch.setattr(mongomock.collection.Collection, "insert_one", always_duplicate)
+    with pytest.raises(PaymentInProgress):
+        pay_fines(TOKEN, "k1")
@@ -0,0 +1,20 @@
+import pytest
+
+from app.services.rule_engine import compile_rules
+
+RULE = {"code": "PUC", "type": "PUC Expired", "field": "puc_expiry", "condition": "expired", "fine": 500}
+
+
+def test_whole_amounts_are_accepted():
+    rule, = compile_rules([{**RULE, "fine": 500.0, "grace_days": 7}])
+    assert rule.fine == 500 and rule.grace.days == 7
+
+
+@pytest.mark.parametrize("change", [
+    {"fine": 499.5}, {"fine": "500"}, {"fine": True}, {"fine": -1}, {"fine": float("inf")},
+    {"grace_days": 1.5}, {"field": "puc_expirry"}, {"field": "owner_name"}, {"type": None},
+    {"condition": "stale"},
+])
+def test_invalid_rules_are_rejected(change):
+    with pytest.raises(ValueError):
+        compile_rules([{**RULE, **change}])
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from app.utils.validators import validate_vehicle
+
+
+def test_vehicle_text_fields_must_be_strings():
+    _, errors = validate_vehicle({
+        "vehicle_no": 1234, "rfid_tag": ["TAG1"], "owner_name": {"$ne": None},
+        "model_no": 5, "mobile_number": 9876543210
+    })
+    assert errors == {field: "Must be a string" for field in
+                      ("vehicle_no", "rfid_tag", "owner_name", "model_no", "mobile_number")}
+
+
+def test_vehicle_blank_fields():
+    clean, errors = validate_vehicle({
+        "vehicle_no": " MH12AB1234 ", "rfid_tag": "TAG1", "owner_name": "  ",
+        "model_no": "", "mobile_number": None, "insurance_expiry": "2030-01-31"
+    })
+    assert errors == {"owner_name": "Required"}
+    assert clean["vehicle_no"] == "MH12AB1234"
+    assert clean["model_no"] is None and clean["mobile_number"] is None
+    assert clean["insurance_expiry"] == datetime(2030, 1, 31)